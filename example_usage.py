@@ -3,36 +3,61 @@
 Example usage of the sandbox runner
 """
 
-from sandbox_runner import run_sandboxed_code, SandboxConfig
-import json
+import sys
 
-# Example 1: Run safe code
-print("=" * 60)
-print("Example 1: Running safe code")
-print("=" * 60)
+from sandbox_runner import run_sandboxed_code, SandboxConfig, SandboxWorker
 
-safe_code = """
+
+class _BufferedOut:
+    """Collects an example's output and writes it to stdout in one go."""
+
+    def __init__(self):
+        self.parts = []
+
+    def print(self, *args, sep=' ', end='\n'):
+        self.parts.append(sep.join(map(str, args)) + end)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        sys.stdout.buffer.write(''.join(self.parts).encode())
+        sys.stdout.buffer.flush()
+        return False
+
+
+# Examples 1-3 and 5 use the default config, so they share one persistent
+# sandbox process instead of starting a fresh interpreter per example
+with SandboxWorker() as worker:
+    # Example 1: Run safe code
+    with _BufferedOut() as out:
+        out.print("=" * 60)
+        out.print("Example 1: Running safe code")
+        out.print("=" * 60)
+
+        safe_code = """
 print("Hello from sandbox!")
 result = sum(range(1, 11))
 print(f"Sum: {result}")
 """
 
-result = run_sandboxed_code(safe_code)
-print("STDOUT:", result['stdout'])
-print("STDERR:", result['stderr'])
-print("Success:", result['success'])
-print("\nReport Summary:")
-report = result['report']
-print(f"  Total activities: {report['execution_summary']['total_activities']}")
-print(f"  Imports: {report['imports']['total']}")
-print(f"  Exceptions: {report['exceptions']['total']}")
-
-# Example 2: Run code with restricted imports
-print("\n" + "=" * 60)
-print("Example 2: Running code with restricted imports")
-print("=" * 60)
-
-restricted_code = """
+        result = worker.run(safe_code)
+        out.print("STDOUT:", result['stdout'])
+        out.print("STDERR:", result['stderr'])
+        out.print("Success:", result['success'])
+        out.print("\nReport Summary:")
+        report = result['report']
+        out.print(f"  Total activities: {report['execution_summary']['total_activities']}")
+        out.print(f"  Imports: {report['imports']['total']}")
+        out.print(f"  Exceptions: {report['exceptions']['total']}")
+
+    # Example 2: Run code with restricted imports
+    with _BufferedOut() as out:
+        out.print("\n" + "=" * 60)
+        out.print("Example 2: Running code with restricted imports")
+        out.print("=" * 60)
+
+        restricted_code = """
 try:
     import os
     print("os imported successfully")
@@ -40,19 +65,21 @@ except ImportError as e:
     print(f"Import blocked: {e}")
 """
 
-result = run_sandboxed_code(restricted_code)
-print("STDOUT:", result['stdout'])
-print("STDERR:", result['stderr'])
-print("\nImport activities:")
-for activity in result['report']['imports']['details']:
-    print(f"  - {activity['details']['module']}: allowed={activity['details']['allowed']}")
-
-# Example 3: Run code with file operations (blocked)
-print("\n" + "=" * 60)
-print("Example 3: Running code with file operations (blocked)")
-print("=" * 60)
-
-file_code = """
+        result = worker.run(restricted_code)
+        out.print("STDOUT:", result['stdout'])
+        out.print("STDERR:", result['stderr'])
+        out.print("\nImport activities:")
+        for activity in result['report']['imports']['details']:
+            d = activity['details']
+            out.print("  - %s: allowed=%s" % (d['module'], d['allowed']))
+
+    # Example 3: Run code with file operations (blocked)
+    with _BufferedOut() as out:
+        out.print("\n" + "=" * 60)
+        out.print("Example 3: Running code with file operations (blocked)")
+        out.print("=" * 60)
+
+        file_code = """
 try:
     with open('test.txt', 'w') as f:
         f.write("test")
@@ -61,39 +88,42 @@ except PermissionError as e:
     print(f"File write blocked: {e}")
 """
 
-result = run_sandboxed_code(file_code)
-print("STDOUT:", result['stdout'])
-print("\nFile operation activities:")
-for activity in result['report']['file_operations']['details']:
-    print(f"  - {activity['details']['operation']} on {activity['details']['path']}: allowed={activity['details']['allowed']}")
-
-# Example 4: Custom configuration
-print("\n" + "=" * 60)
-print("Example 4: Running with custom configuration")
-print("=" * 60)
-
-config = SandboxConfig(
-    timeout_seconds=5.0,
-    memory_limit_mb=64,
-    allow_file_read=True,
-    restricted_imports=['os', 'sys', 'subprocess']
-)
-
-custom_code = """
+        result = worker.run(file_code)
+        out.print("STDOUT:", result['stdout'])
+        out.print("\nFile operation activities:")
+        for activity in result['report']['file_operations']['details']:
+            d = activity['details']
+            out.print("  - %s on %s: allowed=%s" % (d['operation'], d['path'], d['allowed']))
+
+    # Example 4: Custom configuration
+    with _BufferedOut() as out:
+        out.print("\n" + "=" * 60)
+        out.print("Example 4: Running with custom configuration")
+        out.print("=" * 60)
+
+        config = SandboxConfig(
+            timeout_seconds=5.0,
+            memory_limit_mb=64,
+            allow_file_read=True,
+            restricted_imports=['os', 'sys', 'subprocess']
+        )
+
+        custom_code = """
 import math
 print(f"Pi = {math.pi}")
 """
 
-result = run_sandboxed_code(custom_code, config)
-print("STDOUT:", result['stdout'])
-print("Execution time:", result['execution_time'], "seconds")
+        result = run_sandboxed_code(custom_code, config)
+        out.print("STDOUT:", result['stdout'])
+        out.print("Execution time:", result['execution_time'], "seconds")
 
-# Example 5: Generate full report
-print("\n" + "=" * 60)
-print("Example 5: Full activity report")
-print("=" * 60)
+    # Example 5: Generate full report
+    with _BufferedOut() as out:
+        out.print("\n" + "=" * 60)
+        out.print("Example 5: Full activity report")
+        out.print("=" * 60)
 
-test_code = """
+        test_code = """
 import math
 import random
 print("Testing imports and operations")
@@ -101,7 +131,13 @@ result = math.sqrt(16)
 print(f"Square root: {result}")
 """
 
-result = run_sandboxed_code(test_code)
-report_json = json.dumps(result['report'], indent=2)
-print(report_json)
-
+        result = worker.run(test_code)
+        # Only this example serializes anything, so the encoder is imported here.
+        # orjson serializes the report natively; fall back to the stdlib encoder
+        try:
+            import orjson
+            report_json = orjson.dumps(result['report'].to_dict(), option=orjson.OPT_INDENT_2, default=str).decode()
+        except ImportError:
+            import json
+            report_json = json.dumps(result['report'].to_dict(), indent=2)
+        out.print(report_json)
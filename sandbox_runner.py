@@ -1,22 +1,37 @@
-
 import sys
 import subprocess
 import os
 import json
 import time
 import traceback
-from pathlib import Path
+import selectors
+import marshal
+import threading
+import queue
+import re
+import math
+from array import array
+from collections.abc import Mapping
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 import tempfile
 import shutil
 
-# Resource limits are Unix-only
+# orjson parses activity logs and worker results several times faster than
+# the stdlib; both take bytes
 try:
-    import resource
-    HAS_RESOURCE = True
+    import orjson
 except ImportError:
-    HAS_RESOURCE = False
+    orjson = None
+
+
+def _json_loads(data: bytes) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass  # e.g. lone surrogates from guest strings, which json accepts
+    return json.loads(data)
 
 # Signal module may not be available on all platforms
 try:
@@ -25,114 +40,302 @@ try:
 except ImportError:
     HAS_SIGNAL = False
 
+# memfd_create is Linux-only; elsewhere the activity log is a temp file
+HAS_MEMFD = hasattr(os, 'memfd_create')
+
+
+# The sandboxed process raises TimeoutError itself when its time is up; the
+# parent only kills it if it is still running this much later.
+TIMEOUT_GRACE_SECONDS = 1.0
+
+# Script run in the sandboxed process; the policy and code are sent to it as a
+# JSON payload, so nothing is generated or written to disk per run
+WRAPPER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sandbox_wrapper.py')
+
+
+# Substrings that flag an import as dangerous, matched case-insensitively in one
+# regex pass; also sent to the wrapper as part of the policy
+DANGEROUS_IMPORT_PATTERNS = ('subprocess', 'os.', 'sys.', 'socket', 'urllib', 'http', 'ftplib', 'smtplib')
+_DANGEROUS_IMPORT_RE = re.compile('|'.join(map(re.escape, DANGEROUS_IMPORT_PATTERNS)), re.IGNORECASE)
+
+# Built-in activity types; their index is the type id stored by the logger
+ACTIVITY_TYPES = ('import', 'file_operation', 'network', 'exception', 'resource_limit', 'error')
+
+
+class ActivityGroup(Mapping):
+    """Report section for one activity type; details are built on first access."""
+    
+    __slots__ = ('_logger', '_type_id', '_keys', '_cache')
+    
+    def __init__(self, logger: 'SandboxActivityLogger', event_type: str, keys: tuple):
+        self._logger = logger
+        self._type_id = logger.type_id(event_type)
+        self._keys = keys
+        self._cache: Dict[str, Any] = {}
+    
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._cache:
+            logger, type_id = self._logger, self._type_id
+            if key == 'details':
+                self._cache[key] = [logger.activity(i) for i in logger.indices[type_id]]
+            elif key not in self._keys:
+                raise KeyError(key)
+            elif key == 'total':
+                self._cache[key] = len(logger.indices[type_id])
+            elif key == 'allowed':
+                self._cache[key] = logger.allowed_counts[type_id]
+            else:
+                self._cache[key] = logger.blocked_counts[type_id]
+        return self._cache[key]
+    
+    def __iter__(self):
+        return iter(self._keys)
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: self[key] for key in self._keys}
+
+
+class LazyReport(Mapping):
+    """Read-only activity report that only builds the sections that are accessed.
+    
+    Use to_dict() to get a plain dict, e.g. for JSON serialization.
+    """
+    
+    _KEYS = (
+        'execution_summary', 'imports', 'file_operations', 'network_operations',
+        'exceptions', 'resource_limits', 'all_activities'
+    )
+    _COUNTED = ('total', 'allowed', 'blocked', 'details')
+    _GROUPS = {
+        'imports': ('import', _COUNTED),
+        'file_operations': ('file_operation', _COUNTED),
+        'network_operations': ('network', _COUNTED),
+        'exceptions': ('exception', ('total', 'details')),
+        'resource_limits': ('resource_limit', ('details',))
+    }
+    
+    __slots__ = ('_logger', '_start_time', '_end_time', '_cache')
+    
+    def __init__(self, logger: 'SandboxActivityLogger', start_time: float, end_time: float):
+        self._logger = logger
+        self._start_time = start_time
+        self._end_time = end_time
+        self._cache: Dict[str, Any] = {}
+    
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._cache:
+            if key in self._GROUPS:
+                self._cache[key] = ActivityGroup(self._logger, *self._GROUPS[key])
+            elif key == 'execution_summary':
+                self._cache[key] = {
+                    'duration_seconds': self._end_time - self._start_time,
+                    'total_activities': len(self._logger),
+                    'dropped_activities': self._logger.dropped,
+                    'start_time': datetime.fromtimestamp(self._start_time).isoformat(),
+                    'end_time': datetime.fromtimestamp(self._end_time).isoformat()
+                }
+            elif key == 'all_activities':
+                self._cache[key] = self._logger.activities
+            else:
+                raise KeyError(key)
+        return self._cache[key]
+    
+    def __iter__(self):
+        return iter(self._KEYS)
+    
+    def __len__(self) -> int:
+        return len(self._KEYS)
+    
+    def __repr__(self) -> str:
+        return f"LazyReport({self.to_dict()!r})"
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Materialize the full report as nested plain dicts."""
+        return {
+            key: value.to_dict() if isinstance(value, ActivityGroup) else value
+            for key, value in ((key, self[key]) for key in self._KEYS)
+        }
+
 
 class SandboxActivityLogger:
-    """Logs all sandbox activities including imports, file ops, network attempts, etc."""
+    """Logs all sandbox activities including imports, file ops, network attempts, etc.
     
-    def __init__(self):
-        self.activities: List[Dict[str, Any]] = []
+    Activities are stored column-wise: packed arrays of timestamps, type ids and
+    allowed flags (1 allowed, 0 blocked, -1 not applicable) next to a list of
+    details dicts. Per-type activity indices and allowed/blocked counts are
+    kept up to date as activities are logged, so report sections don't scan
+    the columns; the per-activity dicts are only built when details are
+    requested.
+    
+    The columns are pre-sized for expected_activities entries and trimmed to
+    the logged count when the report is generated. At most max_activities
+    are kept (None for no limit); later ones are only counted in dropped, so
+    code that floods the hooks can't grow the log without bound.
+    """
+    
+    __slots__ = (
+        'timestamps', 'type_ids', 'allowed_flags', 'details', '_count',
+        'type_names', '_type_ids', 'indices', 'allowed_counts',
+        'blocked_counts', 'max_activities', 'dropped', 'start_time', 'start_ns'
+    )
+    
+    def __init__(self, expected_activities: int = 16, max_activities: Optional[int] = None):
+        self.timestamps = array('d')
+        self.type_ids = array('B')
+        self.allowed_flags = array('b')
+        self.details: List[Optional[Dict[str, Any]]] = []
+        self._count = 0
+        self.max_activities = max_activities
+        self.dropped = 0
+        self.reserve(expected_activities)
+        self.type_names: List[str] = list(ACTIVITY_TYPES)
+        self._type_ids = {name: i for i, name in enumerate(self.type_names)}
+        self.indices: List[array] = [array('L') for _ in self.type_names]
+        self.allowed_counts: List[int] = [0] * len(self.type_names)
+        self.blocked_counts: List[int] = [0] * len(self.type_names)
         self.start_time = time.time()
+        # Activity timestamps are monotonic_ns() ticks, shared with the
+        # sandboxed process, stored as seconds since the logger was created
+        self.start_ns = time.monotonic_ns()
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def reserve(self, count: int):
+        """Pre-size the columns so the next count activities don't regrow them."""
+        if self.max_activities is not None:
+            count = min(count, self.max_activities - self._count)
+        missing = self._count + count - len(self.details)
+        if missing > 0:
+            self.timestamps.frombytes(bytes(missing * self.timestamps.itemsize))
+            self.type_ids.frombytes(bytes(missing))
+            self.allowed_flags.frombytes(bytes(missing))
+            self.details.extend([None] * missing)
     
-    def log(self, event_type: str, details: Dict[str, Any]):
-        """Log an activity event."""
-        self.activities.append({
-            'timestamp': time.time() - self.start_time,
-            'type': event_type,
-            'details': details
-        })
+    def trim(self):
+        """Drop unused pre-sized slots."""
+        del self.timestamps[self._count:]
+        del self.type_ids[self._count:]
+        del self.allowed_flags[self._count:]
+        del self.details[self._count:]
     
-    def log_import(self, module_name: str, allowed: bool, reason: str = ""):
+    def type_id(self, event_type: str) -> int:
+        """Return the id for event_type, registering it if it's new."""
+        type_id = self._type_ids.get(event_type)
+        if type_id is None:
+            type_id = self._type_ids[event_type] = len(self.type_names)
+            self.type_names.append(event_type)
+            self.indices.append(array('L'))
+            self.allowed_counts.append(0)
+            self.blocked_counts.append(0)
+        return type_id
+    
+    def activity(self, index: int) -> Dict[str, Any]:
+        """Build the dict form of the activity at index."""
+        return {
+            'timestamp': self.timestamps[index],
+            'type': self.type_names[self.type_ids[index]],
+            'details': self.details[index]
+        }
+    
+    @property
+    def activities(self) -> List[Dict[str, Any]]:
+        """All activities as a list of dicts, in logging order."""
+        return [self.activity(i) for i in range(self._count)]
+    
+    def log(self, event_type: str, details: Dict[str, Any], t_ns: Optional[int] = None):
+        """Log an activity event; t_ns is its monotonic_ns() time (default now)."""
+        if self.max_activities is not None and self._count >= self.max_activities:
+            self.dropped += 1
+            return
+        allowed = details.get('allowed')
+        type_id = self.type_id(event_type)
+        if t_ns is None:
+            t_ns = time.monotonic_ns()
+        row = (
+            (t_ns - self.start_ns) / 1e9,
+            type_id,
+            -1 if allowed is None else int(bool(allowed)),
+            details
+        )
+        index = self._count
+        if index < len(self.details):
+            self.timestamps[index], self.type_ids[index], self.allowed_flags[index], self.details[index] = row
+        else:
+            self.timestamps.append(row[0])
+            self.type_ids.append(row[1])
+            self.allowed_flags.append(row[2])
+            self.details.append(details)
+        self._count = index + 1
+        self.indices[type_id].append(index)
+        if allowed is not None:
+            if allowed:
+                self.allowed_counts[type_id] += 1
+            else:
+                self.blocked_counts[type_id] += 1
+    
+    def log_import(self, module_name: str, allowed: bool, reason: str = "", t_ns: Optional[int] = None):
         """Log a module import attempt."""
         self.log('import', {
             'module': module_name,
             'allowed': allowed,
             'reason': reason
-        })
+        }, t_ns)
     
-    def log_file_op(self, operation: str, path: str, allowed: bool, reason: str = ""):
+    def log_file_op(self, operation: str, path: str, allowed: bool, reason: str = "", t_ns: Optional[int] = None):
         """Log a file operation."""
         self.log('file_operation', {
             'operation': operation,
             'path': path,
             'allowed': allowed,
             'reason': reason
-        })
+        }, t_ns)
     
-    def log_network(self, operation: str, address: str, allowed: bool, reason: str = ""):
+    def log_network(self, operation: str, address: str, allowed: bool, reason: str = "", t_ns: Optional[int] = None):
         """Log a network operation."""
         self.log('network', {
             'operation': operation,
             'address': address,
             'allowed': allowed,
             'reason': reason
-        })
+        }, t_ns)
     
-    def log_exception(self, exception_type: str, message: str, traceback: str = ""):
+    def log_exception(self, exception_type: str, message: str, traceback: str = "", t_ns: Optional[int] = None):
         """Log an exception or crash."""
         self.log('exception', {
             'exception_type': exception_type,
             'message': message,
             'traceback': traceback
-        })
+        }, t_ns)
     
-    def log_resource_limit(self, limit_type: str, value: Any):
+    def log_resource_limit(self, limit_type: str, value: Any, t_ns: Optional[int] = None):
         """Log resource limit enforcement."""
         self.log('resource_limit', {
             'limit_type': limit_type,
             'value': value
-        })
+        }, t_ns)
     
-    def generate_report(self) -> Dict[str, Any]:
+    def generate_report(self) -> 'LazyReport':
         """Generate final activity report."""
-        end_time = time.time()
-        duration = end_time - self.start_time
-        
-        # Categorize activities
-        imports = [a for a in self.activities if a['type'] == 'import']
-        file_ops = [a for a in self.activities if a['type'] == 'file_operation']
-        network_ops = [a for a in self.activities if a['type'] == 'network']
-        exceptions = [a for a in self.activities if a['type'] == 'exception']
-        resource_limits = [a for a in self.activities if a['type'] == 'resource_limit']
-        
-        return {
-            'execution_summary': {
-                'duration_seconds': duration,
-                'total_activities': len(self.activities),
-                'start_time': datetime.fromtimestamp(self.start_time).isoformat(),
-                'end_time': datetime.fromtimestamp(end_time).isoformat()
-            },
-            'imports': {
-                'total': len(imports),
-                'allowed': len([i for i in imports if i['details'].get('allowed', False)]),
-                'blocked': len([i for i in imports if not i['details'].get('allowed', True)]),
-                'details': imports
-            },
-            'file_operations': {
-                'total': len(file_ops),
-                'allowed': len([f for f in file_ops if f['details'].get('allowed', False)]),
-                'blocked': len([f for f in file_ops if not f['details'].get('allowed', True)]),
-                'details': file_ops
-            },
-            'network_operations': {
-                'total': len(network_ops),
-                'allowed': len([n for n in network_ops if n['details'].get('allowed', False)]),
-                'blocked': len([n for n in network_ops if not n['details'].get('allowed', True)]),
-                'details': network_ops
-            },
-            'exceptions': {
-                'total': len(exceptions),
-                'details': exceptions
-            },
-            'resource_limits': {
-                'details': resource_limits
-            },
-            'all_activities': self.activities
-        }
+        self.trim()
+        return LazyReport(self, self.start_time, time.time())
 
 
 class SandboxConfig:
     """Configuration for sandbox restrictions."""
     
+    __slots__ = (
+        'timeout_seconds', 'memory_limit_mb', 'cpu_limit_percent',
+        'allow_file_read', 'allow_file_write', 'allow_network',
+        'restricted_imports', 'allowed_imports', 'allowed_file_paths',
+        'allowed_network_addresses', 'enforce_syscall_filter',
+        'track_allocations', 'expected_activities', 'max_activities',
+        'max_output_bytes'
+    )
+    
     def __init__(
         self,
         timeout_seconds: float = 10.0,
@@ -144,7 +347,12 @@ class SandboxConfig:
         restricted_imports: Optional[List[str]] = None,
         allowed_imports: Optional[List[str]] = None,
         allowed_file_paths: Optional[List[str]] = None,
-        allowed_network_addresses: Optional[List[str]] = None
+        allowed_network_addresses: Optional[List[str]] = None,
+        enforce_syscall_filter: bool = False,
+        track_allocations: bool = False,
+        expected_activities: int = 16,
+        max_activities: Optional[int] = 100_000,
+        max_output_bytes: Optional[int] = None
     ):
         self.timeout_seconds = timeout_seconds
         self.memory_limit_mb = memory_limit_mb
@@ -152,10 +360,43 @@ class SandboxConfig:
         self.allow_file_read = allow_file_read
         self.allow_file_write = allow_file_write
         self.allow_network = allow_network
-        self.restricted_imports = restricted_imports or ['os', 'sys', 'subprocess', 'shutil', 'socket', 'urllib']
-        self.allowed_imports = allowed_imports or []
+        # Frozensets give O(1) membership checks on every import and are hashable
+        self.restricted_imports = frozenset(restricted_imports or ['os', 'sys', 'subprocess', 'shutil', 'socket', 'urllib'])
+        self.allowed_imports = frozenset(allowed_imports or [])
         self.allowed_file_paths = allowed_file_paths or []
         self.allowed_network_addresses = allowed_network_addresses or []
+        self.enforce_syscall_filter = enforce_syscall_filter
+        self.track_allocations = track_allocations
+        # Only size and bound the activity log and captured output, so
+        # they're not part of key()
+        self.expected_activities = expected_activities
+        self.max_activities = max_activities
+        self.max_output_bytes = max_output_bytes
+    
+    def key(self) -> tuple:
+        """Return a hashable snapshot of the config, used to cache compiled policies."""
+        return (
+            self.timeout_seconds,
+            self.memory_limit_mb,
+            self.cpu_limit_percent,
+            self.allow_file_read,
+            self.allow_file_write,
+            self.allow_network,
+            self.restricted_imports,
+            self.allowed_imports,
+            tuple(self.allowed_file_paths),
+            tuple(self.allowed_network_addresses),
+            self.enforce_syscall_filter,
+            self.track_allocations
+        )
+    
+    def needs_network_hook(self) -> bool:
+        """Whether the socket hook can log anything under this config.
+        
+        With network access allowed and no address allowlist it never records
+        an event, so the wrapper skips importing and patching socket.
+        """
+        return not self.allow_network or bool(self.allowed_network_addresses)
     
     def is_import_allowed(self, module_name: str) -> tuple[bool, str]:
         """Check if a module import is allowed.
@@ -170,10 +411,9 @@ class SandboxConfig:
             return False, f"Module '{module_name}' is in restricted list"
         
         # Check for dangerous patterns
-        dangerous_patterns = ['subprocess', 'os.', 'sys.', 'socket', 'urllib', 'http', 'ftplib', 'smtplib']
-        for pattern in dangerous_patterns:
-            if pattern in module_name.lower():
-                return False, f"Module '{module_name}' matches dangerous pattern '{pattern}'"
+        match = _DANGEROUS_IMPORT_RE.search(module_name)
+        if match:
+            return False, f"Module '{module_name}' matches dangerous pattern '{match.group(0).lower()}'"
         
         return True, "Allowed"
     
@@ -214,247 +454,362 @@ class SandboxConfig:
         return True, "Allowed"
 
 
-def create_sandbox_wrapper_script(code: str, config: SandboxConfig, log_file: str) -> str:
-    """Create a wrapper script that will execute the user code with hooks."""
+def build_syscall_denylist(config: SandboxConfig) -> List[tuple]:
+    """Map the sandbox config to seccomp deny rules enforced in the child.
     
-    # Escape the code for embedding
-    code_lines = code.split('\n')
-    indented_code = '\n'.join('    ' + line for line in code_lines)
+    Each rule is a (syscall, arg_index, flag_mask) tuple; arg_index is None for
+    rules that deny the syscall outright. Policies that depend on explicit
+    allowlists (paths, addresses) can't be expressed as syscall arguments and
+    are left to the Python-level hooks.
+    """
+    if not config.enforce_syscall_filter:
+        return []
     
-    # Prepare config values as JSON strings
-    restricted_modules_json = json.dumps(config.restricted_imports)
-    allowed_modules_json = json.dumps(config.allowed_imports)
-    allowed_file_paths_json = json.dumps(config.allowed_file_paths)
-    allowed_network_addresses_json = json.dumps(config.allowed_network_addresses)
-    allow_read_bool = str(config.allow_file_read)  # Python bool: True/False
-    allow_write_bool = str(config.allow_file_write)
-    allow_network_bool = str(config.allow_network)
+    rules = []
+    if not config.allow_file_write and not config.allowed_file_paths:
+        for flag in (os.O_WRONLY, os.O_RDWR):
+            rules.append(('open', 1, flag))
+            rules.append(('openat', 2, flag))
+        for name in ('creat', 'unlink', 'unlinkat', 'rename', 'renameat', 'mkdir', 'mkdirat', 'rmdir'):
+            rules.append((name, None, None))
     
-    wrapper_template = f'''#!/usr/bin/env python3
-import sys
-import json
-import traceback
-from datetime import datetime
+    if not config.allow_network and not config.allowed_network_addresses:
+        for name in ('socket', 'connect'):
+            rules.append((name, None, None))
+    
+    if 'subprocess' in config.restricted_imports and 'subprocess' not in config.allowed_imports:
+        for name in ('execve', 'execveat'):
+            rules.append((name, None, None))
+    
+    return rules
 
-# Save original open and stderr before we replace anything
-_original_open = open
-_original_stderr = sys.stderr
 
-# Import hook to monitor imports
-class ImportHook:
-    def __init__(self, log_file):
-        self.log_file = log_file
-        self.builtin_import = __builtins__.__import__
-        self.restricted_modules = {restricted_modules_json}
-        self.allowed_modules = {allowed_modules_json}
-    
-    def log_import(self, module_name, allowed, reason):
+def compile_policy(config: SandboxConfig) -> Dict[str, Any]:
+    """Reduce the config to the JSON-serializable policy sandbox_wrapper.py enforces."""
+    return {
+        'restricted_modules': sorted(config.restricted_imports),
+        'allowed_modules': sorted(config.allowed_imports),
+        'dangerous_patterns': _DANGEROUS_IMPORT_RE.pattern,
+        'allowed_file_paths': config.allowed_file_paths,
+        'allowed_network_addresses': config.allowed_network_addresses,
+        'allow_file_read': config.allow_file_read,
+        'allow_file_write': config.allow_file_write,
+        'allow_network': config.allow_network,
+        'needs_network_hook': config.needs_network_hook(),
+        'syscall_denylist': build_syscall_denylist(config),
+        'memory_limit_mb': config.memory_limit_mb,
+        'timeout_seconds': config.timeout_seconds,
+        'track_allocations': config.track_allocations
+    }
+
+
+# Compiled policies keyed by SandboxConfig.key(), stored already encoded as
+# JSON so repeated runs with an identical config skip both rebuilding the
+# seccomp rule list and re-serializing the policy.
+_POLICY_CACHE: Dict[tuple, bytes] = {}
+_POLICY_CACHE_SIZE = 128
+
+
+def get_compiled_policy(config: SandboxConfig) -> bytes:
+    """Return the JSON-encoded compiled policy for config, compiling it on first use."""
+    key = config.key()
+    policy = _POLICY_CACHE.get(key)
+    if policy is None:
+        if len(_POLICY_CACHE) >= _POLICY_CACHE_SIZE:
+            _POLICY_CACHE.clear()
+        policy = _POLICY_CACHE[key] = json.dumps(compile_policy(config)).encode('utf-8')
+    return policy
+
+
+def encode_frame(data: bytes) -> bytes:
+    """Prefix data with its 4-byte big-endian length."""
+    return len(data).to_bytes(4, 'big') + data
+
+
+def encode_payload(policy: bytes, **fields) -> bytes:
+    """Encode a length-prefixed JSON frame for sandbox_wrapper.py holding the
+    pre-encoded policy alongside fields. Only the per-run fields are
+    serialized here; the policy bytes are spliced in as-is."""
+    data = b'{"policy": ' + policy
+    if fields:
+        data += b', ' + json.dumps(fields).encode('utf-8')[1:]
+    else:
+        data += b'}'
+    return encode_frame(data)
+
+
+def write_payload(fd: int, frame: bytes):
+    """Write frame to fd in full. A child that died before reading it is
+    reported through its exit status instead."""
+    with memoryview(frame) as view:
         try:
-            with _original_open(self.log_file, 'a') as f:
-                f.write(json.dumps({{
-                    'type': 'import',
-                    'module': module_name,
-                    'allowed': allowed,
-                    'reason': reason,
-                    'timestamp': datetime.now().isoformat()
-                }}) + "\\n")
-        except:
+            while view:
+                view = view[os.write(fd, view):]
+        except BrokenPipeError:
             pass
+
+
+def _ingest_import(logger: SandboxActivityLogger, activity: Dict[str, Any]):
+    # The same modules are imported over and over; share one string per name
+    logger.log_import(
+        sys.intern(activity['module']),
+        activity.get('allowed', True),
+        activity.get('reason', ''),
+        activity.get('t')
+    )
+
+
+def _ingest_file_op(logger: SandboxActivityLogger, activity: Dict[str, Any]):
+    logger.log_file_op(
+        activity['operation'],
+        activity['path'],
+        activity.get('allowed', True),
+        activity.get('reason', ''),
+        activity.get('t')
+    )
+
+
+def _ingest_network(logger: SandboxActivityLogger, activity: Dict[str, Any]):
+    logger.log_network(
+        activity['operation'],
+        activity.get('address', 'unknown'),
+        activity.get('allowed', True),
+        activity.get('reason', ''),
+        activity.get('t')
+    )
+
+
+def _ingest_exception(logger: SandboxActivityLogger, activity: Dict[str, Any]):
+    logger.log_exception(
+        activity['exception_type'],
+        activity['message'],
+        activity.get('traceback', ''),
+        activity.get('t')
+    )
+
+
+def _ingest_resource_limit(logger: SandboxActivityLogger, activity: Dict[str, Any]):
+    activity.pop('type')
+    logger.log('resource_limit', activity, activity.pop('t', None))
+
+
+def _ingest_dropped(logger: SandboxActivityLogger, activity: Dict[str, Any]):
+    # Events the sandboxed process stopped recording at max_activities
+    logger.dropped += activity['count']
+
+
+# Handlers for events reported by the sandboxed process, keyed by event type
+_ACTIVITY_HANDLERS = {
+    'import': _ingest_import,
+    'file_operation': _ingest_file_op,
+    'network': _ingest_network,
+    'exception': _ingest_exception,
+    'resource_limit': _ingest_resource_limit,
+    'dropped': _ingest_dropped
+}
+
+
+def ingest_activity(logger: SandboxActivityLogger, activity: Dict[str, Any]):
+    """Record an event reported by the sandboxed process in logger."""
+    handler = _ACTIVITY_HANDLERS.get(activity['type'])
+    if handler is not None:
+        handler(logger, activity)
+
+
+# Serializes spawn_wrapper(): while one child's pipe ends are inheritable, no
+# other sandbox process may be started and pick them up
+_SPAWN_LOCK = threading.Lock()
+
+
+def spawn_wrapper(fds: tuple, inherit_fds: tuple = (), **popen_kwargs) -> subprocess.Popen:
+    """Start sandbox_wrapper.py, handing it fds (closed here in the parent).
     
-    def __call__(self, name, globals=None, locals=None, fromlist=(), level=0):
-        # Check if import is allowed
-        allowed, reason = self.is_import_allowed(name)
-        self.log_import(name, allowed, reason)
-        
-        # Instead of blocking, just log the warning and allow
-        if not allowed:
-            _original_stderr.write(f"WARNING: Restricted import '{{name}}' - {{reason}}\\n")
-            _original_stderr.flush()
-        
-        return self.builtin_import(name, globals, locals, fromlist, level)
+    fds are passed on the command line; inherit_fds are inherited as well
+    but announced to the child some other way (e.g. in the payload).
     
-    def is_import_allowed(self, module_name):
-        # Check allowed FIRST (overrides restrictions)
-        if self.allowed_modules and module_name in self.allowed_modules:
-            return True, "Explicitly allowed (overrides restriction)"
-        if module_name in self.restricted_modules:
-            return False, f"Module '{{module_name}}' is restricted"
-        dangerous_patterns = ['subprocess', 'os.', 'sys.', 'socket', 'urllib', 'http', 'ftplib', 'smtplib']
-        for pattern in dangerous_patterns:
-            if pattern in module_name.lower():
-                return False, f"Module '{{module_name}}' matches dangerous pattern '{{pattern}}'"
-        return True, "Allowed"
+    The fds are inherited rather than passed with pass_fds, the working
+    directory travels in the payload instead of cwd, and resource limits are
+    set by the child itself, so subprocess can start the child with
+    posix_spawn (no fork of this process) instead of fork+exec.
+    """
+    with _SPAWN_LOCK:
+        try:
+            for fd in fds + inherit_fds:
+                os.set_inheritable(fd, True)
+            return subprocess.Popen(
+                [sys.executable, WRAPPER_PATH] + [str(fd) for fd in fds],
+                close_fds=False,
+                **popen_kwargs
+            )
+        finally:
+            for fd in fds + inherit_fds:
+                os.close(fd)
+
 
-# File operation hooks
-class FileHook:
-    def __init__(self, log_file, allow_read, allow_write, allowed_paths):
-        self.log_file = log_file
-        self.allow_read = allow_read
-        self.allow_write = allow_write
-        self.allowed_paths = allowed_paths or []
-        self.original_open = open
+def read_log_fd(fd: int) -> bytes:
+    """Read the whole of the in-memory activity log behind fd.
     
-    def log_file_op(self, operation, path, allowed, reason):
-        try:
-            with _original_open(self.log_file, 'a') as f:
-                f.write(json.dumps({{
-                    'type': 'file_operation',
-                    'operation': operation,
-                    'path': path,
-                    'allowed': allowed,
-                    'reason': reason,
-                    'timestamp': datetime.now().isoformat()
-                }}) + "\\n")
-        except:
-            pass
+    The child wrote through a duplicate sharing this fd's file offset, so
+    read by position with pread rather than from the current offset.
+    """
+    chunks = []
+    offset = 0
+    while True:
+        chunk = os.pread(fd, 65536, offset)
+        if not chunk:
+            return b''.join(chunks)
+        chunks.append(chunk)
+        offset += len(chunk)
+
+
+class OutputBuffer:
+    """Growable byte buffer that pipe data is read into in place via os.readv.
     
-    def is_path_allowed(self, path, operation):
-        import os
-        normalized_path = os.path.normpath(path)
-        for allowed_path in self.allowed_paths:
-            allowed_normalized = os.path.normpath(allowed_path)
-            if normalized_path == allowed_normalized or normalized_path.startswith(allowed_normalized + os.sep):
-                return True, f"File path '{{path}}' is explicitly allowed"
-        return False, None
+    With a limit, the buffer never grows past limit bytes; anything after
+    that is still drained from the pipe (so the writer doesn't block) but only
+    counted in discarded.
+    """
     
-    def open(self, file, mode='r', *args, **kwargs):
-        path = str(file)
-        is_read = 'r' in mode or 'a' in mode
-        is_write = 'w' in mode or 'a' in mode or 'x' in mode
-        
-        # Check if path is explicitly allowed (overrides general restrictions)
-        path_allowed, reason = self.is_path_allowed(path, 'read' if is_read else 'write')
-        if path_allowed:
-            self.log_file_op('open', path, True, reason or f"Mode: {{mode}}")
-            return self.original_open(file, mode, *args, **kwargs)
-        
-        # Instead of blocking, log warning and allow
-        if is_read and not self.allow_read:
-            self.log_file_op('read', path, False, "File read operations are disabled (WARNING)")
-            _original_stderr.write(f"WARNING: File read operation on '{{path}}' - File read operations are disabled\\n")
-            _original_stderr.flush()
-        
-        if is_write and not self.allow_write:
-            self.log_file_op('write', path, False, "File write operations are disabled (WARNING)")
-            _original_stderr.write(f"WARNING: File write operation on '{{path}}' - File write operations are disabled\\n")
-            _original_stderr.flush()
-        
-        self.log_file_op('open', path, True, f"Mode: {{mode}}")
-        return self.original_open(file, mode, *args, **kwargs)
+    __slots__ = ('buffer', 'length', 'limit', 'discarded')
+    
+    def __init__(self, size: int = 65536, limit: Optional[int] = None):
+        self.buffer = bytearray(size if limit is None else min(size, limit))
+        self.length = 0
+        self.limit = limit
+        self.discarded = 0
+    
+    def read_from(self, fd: int) -> int:
+        """Read available data from fd into the buffer. Returns 0 on EOF."""
+        if self.limit is not None and self.length >= self.limit:
+            count = len(os.read(fd, 65536))
+            self.discarded += count
+            return count
+        if self.length == len(self.buffer):
+            grow = len(self.buffer) if self.limit is None else min(len(self.buffer), self.limit - self.length)
+            self.buffer.extend(bytes(grow))
+        with memoryview(self.buffer) as view, view[self.length:] as free:
+            count = os.readv(fd, [free])
+        self.length += count
+        return count
+    
+    def decode(self) -> str:
+        """Decode the collected bytes once, without copying them first."""
+        with memoryview(self.buffer) as view, view[:self.length] as data:
+            return str(data, 'utf-8', 'replace')
+    
+    def getvalue(self) -> bytes:
+        """Return the collected bytes."""
+        with memoryview(self.buffer) as view, view[:self.length] as data:
+            return bytes(data)
 
-# Network operation hooks
-class NetworkHook:
-    def __init__(self, log_file, allow_network, allowed_addresses):
-        self.log_file = log_file
-        self.allow_network = allow_network
-        self.allowed_addresses = allowed_addresses or []
+
+def collect_process_output(
+    process: subprocess.Popen,
+    input_data: Optional[str],
+    timeout: float,
+    text: bool = True,
+    max_output_bytes: Optional[int] = None
+) -> tuple:
+    """Feed stdin and drain stdout/stderr of process until it exits (POSIX only).
     
-    def log_network(self, operation, address, allowed, reason):
-        try:
-            with _original_open(self.log_file, 'a') as f:
-                f.write(json.dumps({{
-                    'type': 'network',
-                    'operation': operation,
-                    'address': address,
-                    'allowed': allowed,
-                    'reason': reason,
-                    'timestamp': datetime.now().isoformat()
-                }}) + "\\n")
-        except:
-            pass
+    Kills the process once timeout seconds have passed. Keeps at most
+    max_output_bytes of each stream (None for no limit).
     
-    def is_address_allowed(self, address):
-        for allowed_addr in self.allowed_addresses:
-            if address.startswith(allowed_addr) or address == allowed_addr:
-                return True, f"Network address '{{address}}' is explicitly allowed"
-        return False, None
-    
-    def block_socket(self, address='unknown'):
-        # Check if address is explicitly allowed (overrides general restriction)
-        addr_allowed, reason = self.is_address_allowed(address)
-        if addr_allowed:
-            self.log_network('socket_create', address, True, reason or "Allowed")
-            return
+    Returns:
+        (stdout, stderr, timed_out, discarded), with stdout/stderr decoded to
+        str if text is True and raw bytes otherwise, and discarded the number
+        of output bytes dropped over the limit
+    """
+    stdout_buffer = OutputBuffer(limit=max_output_bytes)
+    stderr_buffer = OutputBuffer(limit=max_output_bytes)
+    deadline = time.monotonic() + timeout
+    timed_out = False
+    
+    with selectors.DefaultSelector() as selector:
+        selector.register(process.stdout.fileno(), selectors.EVENT_READ, stdout_buffer)
+        selector.register(process.stderr.fileno(), selectors.EVENT_READ, stderr_buffer)
         
-        # Instead of blocking, log warning and allow
-        if not self.allow_network:
-            self.log_network('socket_create', address, False, "Network operations are disabled (WARNING)")
-            _original_stderr.write(f"WARNING: Network operation to '{{address}}' - Network operations are disabled\\n")
-            _original_stderr.flush()
+        pending = None
+        if process.stdin:
+            pending = memoryview(input_data.encode('utf-8'))
+            os.set_blocking(process.stdin.fileno(), False)
+            selector.register(process.stdin.fileno(), selectors.EVENT_WRITE)
+        
+        while selector.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 and not timed_out:
+                process.kill()
+                timed_out = True
+            
+            for key, events in selector.select(None if timed_out else remaining):
+                if events & selectors.EVENT_WRITE:
+                    try:
+                        pending = pending[os.write(key.fd, pending):]
+                    except (BlockingIOError, InterruptedError):
+                        continue
+                    except BrokenPipeError:
+                        pending = pending[:0]
+                    if not pending:
+                        selector.unregister(key.fd)
+                        process.stdin.close()
+                elif key.data.read_from(key.fd) == 0:
+                    selector.unregister(key.fd)
+    
+    process.wait()
+    discarded = stdout_buffer.discarded + stderr_buffer.discarded
+    if text:
+        return stdout_buffer.decode(), stderr_buffer.decode(), timed_out, discarded
+    return stdout_buffer.getvalue(), stderr_buffer.getvalue(), timed_out, discarded
 
-# Install hooks
-import_hook = ImportHook({json.dumps(log_file)})
-file_hook = FileHook({json.dumps(log_file)}, {allow_read_bool}, {allow_write_bool}, {allowed_file_paths_json})
-network_hook = NetworkHook({json.dumps(log_file)}, {allow_network_bool}, {allowed_network_addresses_json})
 
-# Replace built-in import
-__builtins__.__import__ = import_hook
+# Compiled guest code keyed by source, so repeated snippets skip the parser
+_COMPILE_CACHE: Dict[str, Any] = {}
+_COMPILE_CACHE_SIZE = 128
 
-# Replace open function
-__builtins__.open = file_hook.open
 
-# Try to hook socket (may not be imported)
-try:
-    import socket
-    original_socket = socket.socket
-    def socket_wrapper(*args, **kwargs):
-        network_hook.block_socket()
-        return original_socket(*args, **kwargs)
-    socket.socket = socket_wrapper
-except:
-    pass
-
-# Execute user code
-try:
-{indented_code}
-except Exception as e:
-    try:
-        with _original_open({json.dumps(log_file)}, 'a') as f:
-            f.write(json.dumps({{
-                'type': 'exception',
-                'exception_type': type(e).__name__,
-                'message': str(e),
-                'traceback': traceback.format_exc(),
-                'timestamp': datetime.now().isoformat()
-            }}) + "\\n")
-    except:
-        pass
-    raise
-'''
-    
-    return wrapper_template
-
-
-def set_resource_limits(config: SandboxConfig, logger: SandboxActivityLogger):
-    """Set resource limits for the process."""
-    if not HAS_RESOURCE:
-        logger.log('resource_limit', {
-            'limit_type': 'info',
-            'message': 'Resource limits not available on this platform (Windows)'
-        })
-        return
-    
-    try:
-        # Set memory limit (RSS in bytes)
-        memory_bytes = config.memory_limit_mb * 1024 * 1024
-        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
-        logger.log_resource_limit('memory_mb', config.memory_limit_mb)
-    except Exception as e:
-        logger.log('resource_limit', {'limit_type': 'memory', 'error': str(e)})
+# What compiling (or marshaling) guest code can raise. Besides syntax errors,
+# deeply nested or huge expressions exhaust the compiler's recursion limit or
+# memory; all of them make a failed result rather than escape the API.
+COMPILE_ERRORS = (SyntaxError, ValueError, RecursionError, MemoryError, OverflowError)
+
+
+def compile_guest_code(code: str):
+    """Compile guest code for the sandboxed process, reusing earlier compilations.
     
-    try:
-        # Set CPU time limit (soft and hard limits in seconds)
-        cpu_seconds = int(config.timeout_seconds)
-        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
-        logger.log_resource_limit('cpu_time_seconds', cpu_seconds)
-    except Exception as e:
-        logger.log('resource_limit', {'limit_type': 'cpu', 'error': str(e)})
+    The child gets the marshaled code object, so it never parses guest source.
+    """
+    compiled = _COMPILE_CACHE.get(code)
+    if compiled is None:
+        if len(_COMPILE_CACHE) >= _COMPILE_CACHE_SIZE:
+            _COMPILE_CACHE.clear()
+        compiled = _COMPILE_CACHE[code] = compile(code, '<sandbox>', 'exec')
+    return compiled
+
+
+def compile_error_result(
+    error: Exception,
+    logger: SandboxActivityLogger,
+    start_time: float,
+    text: bool = True
+) -> Dict[str, Any]:
+    """Build the result for code that failed to compile in the parent."""
+    logger.log_exception(type(error).__name__, str(error), traceback.format_exc())
+    stderr = ''.join(traceback.format_exception_only(type(error), error))
+    return {
+        'success': False,
+        'stdout': '' if text else b'',
+        'stderr': stderr if text else stderr.encode('utf-8'),
+        'return_code': 1,
+        'execution_time': time.time() - start_time,
+        'report': logger.generate_report()
+    }
 
 
 def run_sandboxed_code(
     code: str,
     config: Optional[SandboxConfig] = None,
-    input_data: Optional[str] = None
+    input_data: Optional[str] = None,
+    text: bool = True
 ) -> Dict[str, Any]:
     """
     Execute untrusted Python code in a sandboxed environment.
@@ -463,6 +818,8 @@ def run_sandboxed_code(
         code: Python code to execute
         config: Sandbox configuration (uses defaults if None)
         input_data: Optional input data to pass to stdin
+        text: Return stdout/stderr as str; pass False to get the raw bytes and
+            skip decoding when the output is only written back out
     
     Returns:
         Dictionary containing execution results and activity report
@@ -470,107 +827,134 @@ def run_sandboxed_code(
     if config is None:
         config = SandboxConfig()
     
-    logger = SandboxActivityLogger()
+    logger = SandboxActivityLogger(config.expected_activities, config.max_activities)
+    
+    try:
+        compiled = compile_guest_code(code)
+    except COMPILE_ERRORS as e:
+        return compile_error_result(e, logger, time.time(), text)
     
     # Create temporary directory for sandbox execution
     temp_dir = tempfile.mkdtemp(prefix='sandbox_')
     log_file = os.path.join(temp_dir, 'activity.log')
     
+    # On Linux the activity log is an anonymous in-memory file the child
+    # inherits, so it never touches the temp directory or the disk
+    log_fd = child_log_fd = -1
+    if HAS_MEMFD:
+        log_fd = os.memfd_create('sandbox_activity', os.MFD_CLOEXEC)
+        child_log_fd = os.dup(log_fd)
+        log_target = {'log_fd': child_log_fd}
+    else:
+        log_target = {'log_file': log_file}
+    
     try:
-        # Create wrapper script
-        wrapper_script = create_sandbox_wrapper_script(code, config, log_file)
-        script_path = os.path.join(temp_dir, 'sandboxed_code.py')
-        
-        with open(script_path, 'w') as f:
-            f.write(wrapper_script)
-        
-        os.chmod(script_path, 0o755)
-        
-        # Prepare subprocess command
-        cmd = [sys.executable, script_path]
-        
-        # Set up subprocess with resource limits (Unix only)
-        # Note: preexec_fn is not supported on Windows
-        preexec_fn = None
-        if HAS_RESOURCE and os.name != 'nt':  # 'nt' is Windows
-            def preexec_fn():
-                """Set resource limits in child process."""
-                set_resource_limits(config, logger)
+        payload = encode_payload(
+            get_compiled_policy(config),
+            cwd=temp_dir,
+            **log_target,
+            # Enforced by the child as well, so a flood of events is never
+            # buffered, written or parsed in full
+            max_activities=config.max_activities,
+            # Applied by the child to itself, so no preexec_fn is needed. Not
+            # part of the policy: a persistent worker would accumulate CPU
+            # time across tasks. CPU time counts from interpreter startup, so
+            # the limit sits above the timeout to let the alarm fire first.
+            cpu_limit_seconds=math.ceil(config.timeout_seconds + TIMEOUT_GRACE_SECONDS),
+            # Only used to show source lines in tracebacks
+            source=code
+        ) + encode_frame(marshal.dumps(compiled))
         
         # Execute with timeout
         start_time = time.time()
         try:
+            # The pipes are drained as raw bytes and decoded once at the end
             popen_kwargs = {
                 'stdin': subprocess.PIPE if input_data else None,
                 'stdout': subprocess.PIPE,
-                'stderr': subprocess.PIPE,
-                'text': True,
-                'cwd': temp_dir
+                'stderr': subprocess.PIPE
             }
-            if preexec_fn is not None:
-                popen_kwargs['preexec_fn'] = preexec_fn
             
-            process = subprocess.Popen(cmd, **popen_kwargs)
-            
-            try:
-                stdout, stderr = process.communicate(
-                    input=input_data,
-                    timeout=config.timeout_seconds
+            if os.name != 'nt':
+                # The payload goes over its own pipe so stdin stays the guest's
+                payload_read, payload_write = os.pipe()
+                inherit_fds = (child_log_fd,) if child_log_fd >= 0 else ()
+                child_log_fd = -1  # closed by spawn_wrapper from here on
+                try:
+                    process = spawn_wrapper((payload_read,), inherit_fds, **popen_kwargs)
+                except BaseException:
+                    os.close(payload_write)
+                    raise
+                try:
+                    write_payload(payload_write, payload)
+                finally:
+                    os.close(payload_write)
+                
+                stdout, stderr, timed_out, discarded = collect_process_output(
+                    process, input_data, config.timeout_seconds + TIMEOUT_GRACE_SECONDS, text,
+                    config.max_output_bytes
                 )
-                return_code = process.returncode
-            except subprocess.TimeoutExpired:
-                process.kill()
-                stdout, stderr = process.communicate()
+                if discarded:
+                    logger.log_resource_limit('output_discarded_bytes', discarded)
+            else:
+                # No fd passing on Windows: the payload precedes the input on
+                # stdin, and the wrapper reads exactly the payload frame
+                popen_kwargs['stdin'] = subprocess.PIPE
+                process = subprocess.Popen([sys.executable, WRAPPER_PATH, '0'], cwd=temp_dir, **popen_kwargs)
+                stdin_data = payload + (input_data or '').encode('utf-8')
+                # select() doesn't work on pipes on Windows
+                try:
+                    stdout, stderr = process.communicate(
+                        input=stdin_data,
+                        timeout=config.timeout_seconds
+                    )
+                    timed_out = False
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    stdout, stderr = process.communicate()
+                    timed_out = True
+                if text:
+                    stdout = stdout.decode('utf-8', 'replace')
+                    stderr = stderr.decode('utf-8', 'replace')
+            
+            if timed_out:
                 return_code = -1
                 logger.log('exception', {
                     'exception_type': 'TimeoutError',
                     'message': f'Execution exceeded timeout of {config.timeout_seconds} seconds'
                 })
+            else:
+                return_code = process.returncode
+                if return_code < 0:
+                    # e.g. SIGKILL from RLIMIT_CPU when the code swallowed the TimeoutError
+                    logger.log_exception('ProcessKilled', f'Sandboxed process was killed by signal {-return_code}')
         
         except Exception as e:
             logger.log_exception(type(e).__name__, str(e), traceback.format_exc())
             return {
                 'success': False,
-                'stdout': '',
-                'stderr': str(e),
+                'stdout': '' if text else b'',
+                'stderr': str(e) if text else str(e).encode('utf-8'),
                 'return_code': -1,
                 'report': logger.generate_report()
             }
         
-        # Parse activity log
-        if os.path.exists(log_file):
+        # Parse activity log: a JSON array the child appends to in batches
+        # and closes at exit
+        if log_fd >= 0 or os.path.exists(log_file):
             try:
-                with open(log_file, 'r') as f:
-                    for line in f:
-                        if line.strip():
-                            activity = json.loads(line.strip())
-                            # Convert to logger format
-                            if activity['type'] == 'import':
-                                logger.log_import(
-                                    activity['module'],
-                                    activity.get('allowed', True),
-                                    activity.get('reason', '')
-                                )
-                            elif activity['type'] == 'file_operation':
-                                logger.log_file_op(
-                                    activity['operation'],
-                                    activity['path'],
-                                    activity.get('allowed', True),
-                                    activity.get('reason', '')
-                                )
-                            elif activity['type'] == 'network':
-                                logger.log_network(
-                                    activity['operation'],
-                                    activity.get('address', 'unknown'),
-                                    activity.get('allowed', True),
-                                    activity.get('reason', '')
-                                )
-                            elif activity['type'] == 'exception':
-                                logger.log_exception(
-                                    activity['exception_type'],
-                                    activity['message'],
-                                    activity.get('traceback', '')
-                                )
+                if log_fd >= 0:
+                    data = read_log_fd(log_fd)
+                else:
+                    with open(log_file, 'rb') as f:
+                        data = f.read()
+                if data and not data.endswith(b']'):
+                    data += b']'  # Killed before exit; keep the batches written so far
+                if data:
+                    activities = _json_loads(data)
+                    logger.reserve(len(activities))
+                    for activity in activities:
+                        ingest_activity(logger, activity)
             except Exception as e:
                 logger.log('error', {'message': f'Failed to parse activity log: {e}'})
         
@@ -588,12 +972,239 @@ def run_sandboxed_code(
     
     finally:
         # Cleanup
+        for fd in (log_fd, child_log_fd):
+            if fd >= 0:
+                os.close(fd)
         try:
             shutil.rmtree(temp_dir)
         except:
             pass
 
 
+class SandboxWorker:
+    """Persistent sandbox process that runs many snippets under one config.
+    
+    The interpreter is started and the hooks are installed once; each run()
+    only ships the code over a pipe and reads back the output and activity
+    events. The worker is restarted transparently after a timeout or crash.
+    Builtins are reset between runs, but guest code still shares the worker's
+    interpreter with earlier runs (sys.modules and the modules in it), so
+    only reuse a worker for code from the same trust domain.
+    
+    On platforms without fd passing (Windows), run() falls back to
+    run_sandboxed_code.
+    
+    Usage:
+        with SandboxWorker(config) as worker:
+            result = worker.run(code)
+    """
+    
+    def __init__(self, config: Optional[SandboxConfig] = None):
+        self.config = config or SandboxConfig()
+        self._process: Optional[subprocess.Popen] = None
+        self._request_fd = -1
+        self._response_fd = -1
+        self._temp_dir: Optional[str] = None
+        self._lock = threading.Lock()
+    
+    def __enter__(self) -> 'SandboxWorker':
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def _start(self):
+        """Spawn the worker process."""
+        self._temp_dir = tempfile.mkdtemp(prefix='sandbox_worker_')
+        request_read, self._request_fd = os.pipe()
+        self._response_fd, response_write = os.pipe()
+        self._process = spawn_wrapper(
+            (request_read, response_write),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        # The first frame on the request pipe is the policy; tasks follow
+        write_payload(self._request_fd, encode_payload(
+            get_compiled_policy(self.config),
+            cwd=self._temp_dir,
+            max_activities=self.config.max_activities,
+            max_output_bytes=self.config.max_output_bytes
+        ))
+    
+    def close(self):
+        """Stop the worker process and remove its working directory."""
+        if self._request_fd >= 0:
+            os.close(self._request_fd)  # EOF ends the worker loop
+            self._request_fd = -1
+        if self._process is not None:
+            try:
+                self._process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+            self._process = None
+        if self._response_fd >= 0:
+            os.close(self._response_fd)
+            self._response_fd = -1
+        if self._temp_dir is not None:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
+    
+    def _receive(self, timeout: float) -> Optional[bytes]:
+        """Read one response frame. Returns None if the worker exited.
+        
+        Raises:
+            TimeoutError: If no complete frame arrived within timeout seconds
+        """
+        deadline = time.monotonic() + timeout
+        buffer = bytearray()
+        expected = None
+        with selectors.DefaultSelector() as selector:
+            selector.register(self._response_fd, selectors.EVENT_READ)
+            while expected is None or len(buffer) < expected:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not selector.select(remaining):
+                    raise TimeoutError
+                chunk = os.read(self._response_fd, 65536)
+                if not chunk:
+                    return None
+                buffer += chunk
+                if expected is None and len(buffer) >= 4:
+                    expected = int.from_bytes(buffer[:4], 'big') + 4
+        return bytes(buffer[4:])
+    
+    def start(self):
+        """Spawn the worker process now rather than on the first run()."""
+        if os.name == 'nt':
+            return
+        with self._lock:
+            self._ensure_running()
+    
+    def _ensure_running(self):
+        if self._process is None or self._process.poll() is not None:
+            self.close()
+            self._start()
+    
+    def run(self, code: str, input_data: Optional[str] = None, text: bool = True) -> Dict[str, Any]:
+        """Execute code in the worker. Returns the same dict as run_sandboxed_code."""
+        if os.name == 'nt':
+            return run_sandboxed_code(code, self.config, input_data, text)
+        
+        result = self._run_task(code, input_data)
+        if not text:
+            # The worker's in-memory streams accept lone surrogates, which
+            # strict UTF-8 can't encode; replace them as decoding the
+            # one-shot output does
+            result['stdout'] = result['stdout'].encode('utf-8', 'replace')
+            result['stderr'] = result['stderr'].encode('utf-8', 'replace')
+        return result
+    
+    def _run_task(self, code: str, input_data: Optional[str]) -> Dict[str, Any]:
+        with self._lock:
+            self._ensure_running()
+            
+            logger = SandboxActivityLogger(self.config.expected_activities, self.config.max_activities)
+            start_time = time.time()
+            try:
+                payload = marshal.dumps((compile_guest_code(code), input_data))
+            except COMPILE_ERRORS as e:
+                return compile_error_result(e, logger, start_time)
+            
+            try:
+                with open(self._request_fd, 'wb', closefd=False) as requests:
+                    requests.write(len(payload).to_bytes(4, 'big') + payload)
+                response = self._receive(self.config.timeout_seconds + TIMEOUT_GRACE_SECONDS)
+            except TimeoutError:
+                self._process.kill()
+                self.close()
+                logger.log('exception', {
+                    'exception_type': 'TimeoutError',
+                    'message': f'Execution exceeded timeout of {self.config.timeout_seconds} seconds'
+                })
+                return {
+                    'success': False,
+                    'stdout': '',
+                    'stderr': '',
+                    'return_code': -1,
+                    'execution_time': time.time() - start_time,
+                    'report': logger.generate_report()
+                }
+            except BrokenPipeError:
+                response = None
+            
+            if response is None:
+                return_code = self._process.wait()
+                self.close()
+                logger.log_exception('ProcessExit', f'Sandbox worker exited with code {return_code}')
+                return {
+                    'success': False,
+                    'stdout': '',
+                    'stderr': '',
+                    'return_code': return_code,
+                    'execution_time': time.time() - start_time,
+                    'report': logger.generate_report()
+                }
+            
+            result = _json_loads(response)
+            logger.reserve(len(result['events']))
+            for activity in result['events']:
+                ingest_activity(logger, activity)
+            if result.get('discarded'):
+                logger.log_resource_limit('output_discarded_bytes', result['discarded'])
+            
+            return {
+                'success': result['return_code'] == 0,
+                'stdout': result['stdout'],
+                'stderr': result['stderr'],
+                'return_code': result['return_code'],
+                'execution_time': time.time() - start_time,
+                'report': logger.generate_report()
+            }
+
+
+class SandboxWorkerPool:
+    """Fixed-size pool of warm SandboxWorkers sharing one config.
+    
+    All workers are started up front. run() takes an idle worker, waiting
+    while all of them are busy, so up to size snippets run in parallel from
+    different threads. Workers restart themselves after a timeout or crash,
+    so a failed run doesn't shrink the pool. The same trust-domain caveat as
+    SandboxWorker applies.
+    
+    Usage:
+        with SandboxWorkerPool(config, size=4) as pool:
+            result = pool.run(code)
+    """
+    
+    def __init__(self, config: Optional[SandboxConfig] = None, size: int = 4):
+        self.config = config or SandboxConfig()
+        self._workers = [SandboxWorker(self.config) for _ in range(size)]
+        self._idle: 'queue.Queue[SandboxWorker]' = queue.Queue()
+        for worker in self._workers:
+            worker.start()
+            self._idle.put(worker)
+    
+    def __enter__(self) -> 'SandboxWorkerPool':
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def run(self, code: str, input_data: Optional[str] = None, text: bool = True) -> Dict[str, Any]:
+        """Execute code on an idle worker. Returns the same dict as run_sandboxed_code."""
+        worker = self._idle.get()
+        try:
+            return worker.run(code, input_data, text)
+        finally:
+            self._idle.put(worker)
+    
+    def close(self):
+        """Stop all workers."""
+        for worker in self._workers:
+            worker.close()
+
+
 def main():
     """Main entry point for command-line usage."""
     import argparse
@@ -612,6 +1223,8 @@ def main():
     parser.add_argument('--allowed-imports', nargs='+', help='List of allowed module names (overrides restrictions)')
     parser.add_argument('--allowed-file-paths', nargs='+', help='List of allowed file paths (overrides file restrictions)')
     parser.add_argument('--allowed-network-addresses', nargs='+', help='List of allowed network addresses (overrides network restrictions)')
+    parser.add_argument('--enforce-syscall-filter', action='store_true', help='Deny disabled file/network syscalls in-kernel via seccomp (Linux, needs libseccomp)')
+    parser.add_argument('--track-allocations', action='store_true', help='Report peak traced memory (slows down allocations)')
     parser.add_argument('--report', help='Path to save JSON report')
     parser.add_argument('--input', help='Path to input file for stdin')
     
@@ -638,22 +1251,26 @@ def main():
         restricted_imports=args.restricted_imports,
         allowed_imports=args.allowed_imports,
         allowed_file_paths=getattr(args, 'allowed_file_paths', None),
-        allowed_network_addresses=getattr(args, 'allowed_network_addresses', None)
+        allowed_network_addresses=getattr(args, 'allowed_network_addresses', None),
+        enforce_syscall_filter=args.enforce_syscall_filter,
+        track_allocations=args.track_allocations
     )
     
-    # Run sandbox
-    result = run_sandboxed_code(code, config, input_data)
+    # Run sandbox; output is relayed as raw bytes, so skip decoding it
+    result = run_sandboxed_code(code, config, input_data, text=False)
     
     # Output results
     if result['stdout']:
-        print(result['stdout'], end='')
+        sys.stdout.buffer.write(result['stdout'])
+        sys.stdout.flush()
     if result['stderr']:
-        print(result['stderr'], file=sys.stderr, end='')
+        sys.stderr.buffer.write(result['stderr'])
+        sys.stderr.flush()
     
     # Save report if requested
     if args.report:
         with open(args.report, 'w') as f:
-            json.dump(result['report'], f, indent=2)
+            json.dump(result['report'].to_dict(), f, indent=2)
         print(f"\nReport saved to {args.report}", file=sys.stderr)
     else:
         # Print summary
@@ -1,12 +1,435 @@
 #!/usr/bin/env python3
 """
 Simple HTTP server for testing the sandbox runner on localhost
+
+Served as an ASGI app under uvicorn when it is installed, so concurrent
+requests don't queue behind each other; otherwise falls back to the
+stdlib ThreadingHTTPServer.
 """
 
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import gzip
+import hashlib
 import json
+import os
+import sys
+import threading
+import time
+import zlib
 import urllib.parse
-from sandbox_runner import run_sandboxed_code, SandboxConfig
+from typing import List, Optional
+from sandbox_runner import run_sandboxed_code, SandboxConfig, get_compiled_policy
+
+# uvicorn is optional; without it the stdlib server is used
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+# uvloop (libuv) and httptools replace the pure-Python event loop and HTTP
+# parser under uvicorn when installed
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    import httptools
+except ImportError:
+    httptools = None
+
+# orjson serializes reports several times faster and works in bytes, saving
+# an encode/decode pass per request
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# msgspec decodes and validates request bodies in one C-level pass; without
+# it they are parsed as JSON and the fields coerced by hand
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# brotli is optional; gzip is always available
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this are sent uncompressed; the encoding overhead
+# would outweigh the savings
+COMPRESS_MIN_BYTES = 1024
+
+# Large responses are serialized and sent in pieces of about this size, so
+# the full encoded body is never held in memory at once
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# Larger /execute request bodies are refused with 413
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+
+# Sandbox runs mostly wait on their child process, so a few per core can
+# overlap; the pool caps how many run at once however many requests arrive
+_EXECUTOR = ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) * 2)
+
+
+def _json_dumps(obj) -> bytes:
+    """Serialize obj as indented UTF-8 JSON"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+        except orjson.JSONEncodeError:
+            pass  # e.g. lone surrogates, which json escapes
+    return json.dumps(obj, indent=2).encode()
+
+
+def _json_loads(data: bytes):
+    """Parse a UTF-8 JSON request body"""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass  # e.g. lone surrogates, which json accepts
+    return json.loads(data)
+
+
+API_INFO = {
+    'status': 'running',
+    'message': 'Sandbox Runner API',
+    'endpoints': {
+        'POST /execute': 'Execute Python code in sandbox',
+        'GET /health': 'Health check'
+    }
+}
+
+# API_INFO never changes, so it is serialized once for every health check
+_HEALTH_BODY = _json_dumps(API_INFO)
+_HEALTH_LENGTH = str(len(_HEALTH_BODY))
+
+
+class InvalidRequest(ValueError):
+    """An /execute request body that is not a valid request"""
+
+
+class RequestTooLarge(InvalidRequest):
+    """An /execute request body over MAX_REQUEST_BYTES"""
+
+
+if msgspec is not None:
+    class ExecuteRequest(msgspec.Struct, frozen=True):
+        """Body of a POST /execute request"""
+        code: str = ''
+        timeout: float = 10.0
+        memory: int = 128
+        allow_file_read: bool = False
+        allow_file_write: bool = False
+        allow_network: bool = False
+        restricted_imports: Optional[List[str]] = None
+        allowed_imports: Optional[List[str]] = None
+        input: Optional[str] = None
+    
+    _REQUEST_DECODER = msgspec.json.Decoder(ExecuteRequest)
+    
+    def parse_execute_request(body: bytes) -> ExecuteRequest:
+        """Decode and validate an /execute request body"""
+        try:
+            return _REQUEST_DECODER.decode(body)
+        except msgspec.ValidationError as e:
+            raise InvalidRequest(f"Invalid request: {e}")
+        except msgspec.DecodeError:
+            raise InvalidRequest("Invalid JSON")
+else:
+    class ExecuteRequest:
+        """Body of a POST /execute request"""
+        
+        __slots__ = ('code', 'timeout', 'memory', 'allow_file_read', 'allow_file_write',
+                     'allow_network', 'restricted_imports', 'allowed_imports', 'input')
+        
+        def __init__(self, code: str = '', timeout: float = 10.0, memory: int = 128,
+                     allow_file_read: bool = False, allow_file_write: bool = False,
+                     allow_network: bool = False, restricted_imports: Optional[List[str]] = None,
+                     allowed_imports: Optional[List[str]] = None, input: Optional[str] = None):
+            self.code = code
+            self.timeout = timeout
+            self.memory = memory
+            self.allow_file_read = allow_file_read
+            self.allow_file_write = allow_file_write
+            self.allow_network = allow_network
+            self.restricted_imports = restricted_imports
+            self.allowed_imports = allowed_imports
+            self.input = input
+    
+    def _optional_str_list(data: dict, name: str) -> Optional[List[str]]:
+        value = data.get(name)
+        if value is not None and (
+            not isinstance(value, list) or not all(isinstance(item, str) for item in value)
+        ):
+            raise InvalidRequest(f"Invalid request: {name} must be a list of strings")
+        return value
+    
+    def parse_execute_request(body: bytes) -> ExecuteRequest:
+        """Decode an /execute request body, checking and coercing the fields
+        by hand"""
+        try:
+            data = _json_loads(body)
+        except ValueError:  # JSONDecodeError, or bytes that aren't UTF-8
+            raise InvalidRequest("Invalid JSON")
+        if not isinstance(data, dict):
+            raise InvalidRequest("Invalid request: expected a JSON object")
+        code = data.get('code', '')
+        if not isinstance(code, str):
+            raise InvalidRequest("Invalid request: code must be a string")
+        input_data = data.get('input')
+        if input_data is not None and not isinstance(input_data, str):
+            raise InvalidRequest("Invalid request: input must be a string")
+        try:
+            timeout = float(data.get('timeout', 10.0))
+            memory = int(data.get('memory', 128))
+        except (TypeError, ValueError, OverflowError) as e:
+            raise InvalidRequest(f"Invalid request: {e}")
+        return ExecuteRequest(
+            code=code,
+            timeout=timeout,
+            memory=memory,
+            allow_file_read=bool(data.get('allow_file_read', False)),
+            allow_file_write=bool(data.get('allow_file_write', False)),
+            allow_network=bool(data.get('allow_network', False)),
+            restricted_imports=_optional_str_list(data, 'restricted_imports'),
+            allowed_imports=_optional_str_list(data, 'allowed_imports'),
+            input=input_data
+        )
+
+
+def build_config(request: ExecuteRequest) -> SandboxConfig:
+    """Build the sandbox config for an /execute request"""
+    return SandboxConfig(
+        timeout_seconds=request.timeout,
+        memory_limit_mb=request.memory,
+        allow_file_read=request.allow_file_read,
+        allow_file_write=request.allow_file_write,
+        allow_network=request.allow_network,
+        restricted_imports=request.restricted_imports,
+        allowed_imports=request.allowed_imports
+    )
+
+
+def execute_request(request: ExecuteRequest, config: SandboxConfig) -> dict:
+    """Run the code from an /execute request and build the response"""
+    result = run_sandboxed_code(request.code, config, request.input)
+    # The result already has the response's shape; only the report needs
+    # turning into plain dicts, so it is updated in place rather than copied
+    result.setdefault('execution_time', 0)
+    result['report'] = result['report'].to_dict()
+    return result
+
+
+class ResultCache:
+    """Thread-safe LRU cache of /execute responses as encoded JSON, each kept
+    for ttl seconds and together holding at most max_bytes of bodies"""
+    
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0,
+                 max_bytes: int = 32 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expiry, body)
+        self._bytes = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached response body for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                self._bytes -= len(entry[1])
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+    
+    def put(self, key: str, body: bytes):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._entries[key] = (time.monotonic() + self.ttl, body)
+            self._bytes += len(body)
+            while len(self._entries) > self.maxsize or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+
+RESULT_CACHE = ResultCache()
+
+
+def execute_and_cache(request: ExecuteRequest, config: SandboxConfig, key: Optional[str]):
+    """Run an /execute request. With a cache key, a response that fits in one
+    STREAM_CHUNK_BYTES chunk is encoded once, stored in RESULT_CACHE and
+    returned as those bytes, so later hits are sent without serializing the
+    report again. Larger responses and runs that failed to start are
+    returned as the dict and never cached."""
+    response = execute_request(request, config)
+    if not key or response.get('return_code') == -1:
+        return response
+    # Cheap check first: big outputs alone rule out a single chunk
+    if len(response['stdout']) + len(response['stderr']) >= STREAM_CHUNK_BYTES:
+        return response
+    body = _json_dumps(response)
+    if len(body) > STREAM_CHUNK_BYTES:
+        return response
+    RESULT_CACHE.put(key, body)
+    return body
+
+
+def result_cache_key(request: ExecuteRequest, config: SandboxConfig):
+    """Key identifying an /execute request's code and config, also used as
+    its ETag, or None for requests with input, which aren't cached"""
+    if request.input:
+        return None
+    # The compiled policy is canonical JSON covering everything the run
+    # depends on besides the code
+    digest = hashlib.blake2b(get_compiled_policy(config), digest_size=16)
+    digest.update(request.code.encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()
+
+
+def _etag_matches(if_none_match: str, key: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    tags = (tag.strip() for tag in if_none_match.split(','))
+    return f'"{key}"' in (tag[2:] if tag.startswith('W/') else tag for tag in tags)
+
+
+def _accepted_encodings(accept_encoding: str) -> set:
+    """Content codings from an Accept-Encoding header, minus any refused with q=0"""
+    encodings = set()
+    for item in accept_encoding.split(','):
+        coding, _, params = item.partition(';')
+        params = params.replace(' ', '')
+        if params in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        encodings.add(coding.strip().lower())
+    return encodings
+
+
+def compress_body(body: bytes, accept_encoding: str):
+    """Compress body with the best coding the client accepts.
+    
+    Returns (body, content_encoding); content_encoding is None when body is
+    below COMPRESS_MIN_BYTES or the client accepts neither br nor gzip.
+    """
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    encodings = _accepted_encodings(accept_encoding)
+    if brotli is not None and 'br' in encodings:
+        return brotli.compress(body, quality=4), 'br'
+    if 'gzip' in encodings:
+        # Fastest level: reports are repetitive JSON, so this already
+        # shrinks them several times over for little CPU
+        return gzip.compress(body, compresslevel=1), 'gzip'
+    return body, None
+
+
+def iter_json(obj, indent: bytes = b'\n'):
+    """Yield obj as the same indented JSON _json_dumps produces, one dict
+    member at a time, so nested reports are never serialized in one piece"""
+    if not isinstance(obj, dict) or not obj:
+        # Encoded JSON has no raw newlines inside strings, so re-indenting
+        # the nested lines is safe
+        yield _json_dumps(obj).replace(b'\n', indent)
+        return
+    inner = indent + b'  '
+    separator = b'{' + inner
+    for key, value in obj.items():
+        yield separator + _json_dumps(key) + b': '
+        yield from iter_json(value, inner)
+        separator = b',' + inner
+    yield indent + b'}'
+
+
+def _coalesce(pieces, size: int):
+    """Join small byte strings from pieces into chunks of at least size bytes"""
+    buffer = []
+    length = 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield b''.join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def _compress_stream(chunks, encoding: str):
+    """Compress chunks incrementally with encoding ('br' or 'gzip')"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=4)
+        compress, flush = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(1, zlib.DEFLATED, 31)  # 31: gzip framing
+        compress, flush = compressor.compress, compressor.flush
+    for chunk in chunks:
+        data = compress(chunk)
+        if data:
+            yield data
+    yield flush()
+
+
+def stream_json(response, accept_encoding: str):
+    """Encode response for sending, compressed if the client accepts it.
+    
+    response is a dict, or its already-encoded JSON as kept in RESULT_CACHE.
+    
+    Returns (chunks, content_encoding, content_length). A response that fits
+    in one STREAM_CHUNK_BYTES chunk is encoded whole and gets a length; a
+    larger one is streamed and content_length is None.
+    """
+    pieces = (response,) if isinstance(response, bytes) else iter_json(response)
+    chunks = _coalesce(pieces, STREAM_CHUNK_BYTES)
+    first = next(chunks, b'')
+    second = next(chunks, None)
+    if second is None:
+        body, encoding = compress_body(first, accept_encoding)
+        return [body], encoding, len(body)
+    
+    def remaining():
+        yield first
+        yield second
+        yield from chunks
+    
+    encodings = _accepted_encodings(accept_encoding)
+    if brotli is not None and 'br' in encodings:
+        return _compress_stream(remaining(), 'br'), 'br', None
+    if 'gzip' in encodings:
+        return _compress_stream(remaining(), 'gzip'), 'gzip', None
+    return remaining(), None, None
+
+
+def _read_body_into(rfile, length: int) -> bytearray:
+    """Read up to length bytes from rfile into a buffer grown as data
+    arrives, so a Content-Length the client never follows up on doesn't
+    reserve memory; the JSON decoders take the buffer as-is"""
+    body = bytearray()
+    while len(body) < length:
+        chunk = rfile.read1(min(length - len(body), STREAM_CHUNK_BYTES))
+        if not chunk:
+            break
+        body += chunk
+    return body
+
+
+# Bound once; log_message runs for every request
+_write_log = sys.stdout.write
 
 
 class SandboxHandler(BaseHTTPRequestHandler):
@@ -26,17 +449,10 @@ class SandboxHandler(BaseHTTPRequestHandler):
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Content-Length', _HEALTH_LENGTH)
             self.end_headers()
             
-            response = {
-                'status': 'running',
-                'message': 'Sandbox Runner API',
-                'endpoints': {
-                    'POST /execute': 'Execute Python code in sandbox',
-                    'GET /health': 'Health check'
-                }
-            }
-            self.wfile.write(json.dumps(response, indent=2).encode())
+            self.wfile.write(_HEALTH_BODY)
         else:
             self.send_response(404)
             self.end_headers()
@@ -46,49 +462,63 @@ class SandboxHandler(BaseHTTPRequestHandler):
         if self.path == '/execute':
             try:
                 # Read request body
-                content_length = int(self.headers.get('Content-Length', 0))
-                body = self.rfile.read(content_length)
-                data = json.loads(body.decode('utf-8'))
+                try:
+                    content_length = int(self.headers.get('Content-Length', 0))
+                except ValueError:
+                    content_length = -1
+                if content_length <= 0:
+                    self.send_error(400, "Missing or invalid Content-Length")
+                    return
+                if content_length > MAX_REQUEST_BYTES:
+                    self.send_error(413, "Request body too large")
+                    return
+                body = _read_body_into(self.rfile, content_length)
+                request = parse_execute_request(body)
                 
-                # Extract code and config
-                code = data.get('code', '')
-                if not code:
+                # Extract code
+                if not request.code:
                     self.send_error(400, "Missing 'code' parameter")
                     return
                 
-                # Build config from request
-                config = SandboxConfig(
-                    timeout_seconds=float(data.get('timeout', 10.0)),
-                    memory_limit_mb=int(data.get('memory', 128)),
-                    allow_file_read=bool(data.get('allow_file_read', False)),
-                    allow_file_write=bool(data.get('allow_file_write', False)),
-                    allow_network=bool(data.get('allow_network', False)),
-                    restricted_imports=data.get('restricted_imports', None),
-                    allowed_imports=data.get('allowed_imports', None)
-                )
+                # Reuse the response to an identical earlier request
+                config = build_config(request)
+                key = result_cache_key(request, config)
+                response = RESULT_CACHE.get(key) if key else None
+                if response is not None and _etag_matches(self.headers.get('If-None-Match'), key):
+                    self.send_response(304)
+                    self.send_header('Access-Control-Allow-Origin', '*')
+                    self.send_header('Vary', 'Accept-Encoding')
+                    self.send_header('ETag', f'"{key}"')
+                    self.end_headers()
+                    return
                 
                 # Execute code
-                result = run_sandboxed_code(code, config, data.get('input'))
+                if response is None:
+                    response = _EXECUTOR.submit(execute_and_cache, request, config, key).result()
                 
-                # Send response
+                # Send response; without a Content-Length the body simply
+                # runs until the HTTP/1.0 connection closes
+                chunks, encoding, length = stream_json(
+                    response,
+                    self.headers.get('Accept-Encoding', '')
+                )
                 self.send_response(200)
                 self.send_header('Content-type', 'application/json')
                 self.send_header('Access-Control-Allow-Origin', '*')
+                self.send_header('Vary', 'Accept-Encoding')
+                if key:
+                    self.send_header('ETag', f'"{key}"')
+                if encoding:
+                    self.send_header('Content-Encoding', encoding)
+                if length is not None:
+                    self.send_header('Content-Length', str(length))
                 self.end_headers()
                 
-                response = {
-                    'success': result['success'],
-                    'stdout': result['stdout'],
-                    'stderr': result['stderr'],
-                    'return_code': result['return_code'],
-                    'execution_time': result.get('execution_time', 0),
-                    'report': result['report']
-                }
-                
-                self.wfile.write(json.dumps(response, indent=2).encode())
-                
-            except json.JSONDecodeError:
-                self.send_error(400, "Invalid JSON")
+                for chunk in chunks:
+                    self.wfile.write(chunk)
+            
+            except InvalidRequest as e:
+                self.send_error(400, str(e))
             except Exception as e:
                 self.send_error(500, f"Server error: {str(e)}")
         else:
@@ -97,17 +527,153 @@ class SandboxHandler(BaseHTTPRequestHandler):
     
     def log_message(self, format, *args):
         """Override to customize logging"""
-        print(f"[{self.address_string()}] {format % args}")
+        _write_log(''.join(('[', self.client_address[0], '] ', format % args, '\n')))
+
+
+async def _send(send, status: int, body: bytes = b'', headers: list = ()):
+    """Send a complete ASGI HTTP response"""
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'access-control-allow-origin', b'*'), *headers]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _stream_json(send, response, accept_encoding: str, etag_key: str = None):
+    """Send response as JSON, compressed if accept_encoding allows and in
+    several body messages if it is large (the server then uses chunked
+    transfer encoding)"""
+    chunks, encoding, length = stream_json(response, accept_encoding)
+    headers = [
+        (b'access-control-allow-origin', b'*'),
+        (b'content-type', b'application/json'),
+        (b'vary', b'Accept-Encoding')
+    ]
+    if etag_key:
+        headers.append((b'etag', f'"{etag_key}"'.encode()))
+    if encoding:
+        headers.append((b'content-encoding', encoding.encode()))
+    if length is not None:
+        headers.append((b'content-length', str(length).encode()))
+    await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+    for chunk in chunks:
+        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _send_error(send, status: int, message: str):
+    await _send(send, status, message.encode(),
+                [(b'content-type', b'text/plain; charset=utf-8')])
+
+
+async def _read_body(receive) -> bytes:
+    """Read the whole ASGI request body, up to MAX_REQUEST_BYTES"""
+    chunks = []
+    length = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunk = message.get('body', b'')
+        length += len(chunk)
+        if length > MAX_REQUEST_BYTES:
+            raise RequestTooLarge("Request body too large")
+        chunks.append(chunk)
+        more_body = message.get('more_body', False)
+    return b''.join(chunks)
+
+
+async def app(scope, receive, send):
+    """ASGI app serving the same API as SandboxHandler.
+    
+    Sandbox runs block on their child process, so they are handed to the
+    executor thread pool; the event loop stays free to accept and read other
+    requests meanwhile.
+    """
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] != 'http':
+        return
+    
+    method = scope['method']
+    path = scope['path']
+    if method == 'OPTIONS':
+        # CORS preflight
+        await _send(send, 200, headers=[
+            (b'access-control-allow-methods', b'POST, GET, OPTIONS'),
+            (b'access-control-allow-headers', b'Content-Type')
+        ])
+    elif method == 'GET' and path in ('/', '/health'):
+        await _send(send, 200, _HEALTH_BODY, [
+            (b'content-type', b'application/json'),
+            (b'content-length', _HEALTH_LENGTH.encode())
+        ])
+    elif method == 'POST' and path == '/execute':
+        try:
+            request = parse_execute_request(await _read_body(receive))
+            if not request.code:
+                await _send_error(send, 400, "Missing 'code' parameter")
+                return
+            
+            # Reuse the response to an identical earlier request
+            config = build_config(request)
+            key = result_cache_key(request, config)
+            response = RESULT_CACHE.get(key) if key else None
+            headers = dict(scope['headers'])
+            if response is not None and _etag_matches(
+                    headers.get(b'if-none-match', b'').decode('latin-1'), key):
+                await _send(send, 304, headers=[
+                    (b'vary', b'Accept-Encoding'),
+                    (b'etag', f'"{key}"'.encode())
+                ])
+                return
+            
+            if response is None:
+                response = await asyncio.get_running_loop().run_in_executor(
+                    _EXECUTOR, execute_and_cache, request, config, key
+                )
+        except RequestTooLarge as e:
+            await _send_error(send, 413, str(e))
+            return
+        except InvalidRequest as e:
+            await _send_error(send, 400, str(e))
+            return
+        except Exception as e:
+            await _send_error(send, 500, f"Server error: {str(e)}")
+            return
+        accept_encoding = headers.get(b'accept-encoding', b'')
+        await _stream_json(send, response, accept_encoding.decode('latin-1'), key)
+    else:
+        await _send(send, 404)
 
 
 def run_server(port=8000):
     """Run the sandbox server"""
-    server_address = ('', port)
-    httpd = HTTPServer(server_address, SandboxHandler)
     print(f"Sandbox Runner API Server running on http://localhost:{port}")
     print(f"Health check: http://localhost:{port}/health")
     print(f"Execute code: POST http://localhost:{port}/execute")
     print("\nPress Ctrl+C to stop the server")
+    if uvicorn is not None:
+        uvicorn.run(
+            app,
+            host='0.0.0.0',
+            port=port,
+            loop='uvloop' if uvloop is not None else 'asyncio',
+            http='httptools' if httptools is not None else 'h11'
+        )
+        return
+    
+    server_address = ('', port)
+    # A thread per connection, so one slow run doesn't hold up other clients
+    httpd = ThreadingHTTPServer(server_address, SandboxHandler)
     try:
         httpd.serve_forever()
     except KeyboardInterrupt:
@@ -116,7 +682,5 @@ def run_server(port=8000):
 
 
 if __name__ == '__main__':
-    import sys
     port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
     run_server(port)
-
@@ -0,0 +1,641 @@
+#!/usr/bin/env python3
+"""
+Sandbox-side half of sandbox_runner: installs the monitoring hooks and runs
+the guest code. Started by sandbox_runner, not meant to be imported.
+
+Usage: python sandbox_wrapper.py PAYLOAD_FD [RESPONSE_FD]
+
+The parent writes a length-prefixed JSON payload to PAYLOAD_FD holding the
+compiled policy (see sandbox_runner.compile_policy) and the activity log
+path, followed by a frame with the marshaled code object to run.
+
+When RESPONSE_FD is given the process is a persistent SandboxWorker
+instead: the payload only carries the policy, and tasks follow as further
+frames on PAYLOAD_FD.
+"""
+
+import sys
+import os
+import io
+import re
+import json
+import atexit
+import marshal
+import signal
+import builtins
+import time
+import linecache
+import traceback
+
+# Save original open and stderr before we replace anything
+_original_open = open
+_original_stderr = sys.stderr
+
+# Events are collected in _task_events. In a one-shot run they are written to
+# the activity log as one JSON array, flushed in batches of _FLUSH_EVENTS so
+# neither the list nor any single encode grows with the number of events.
+_task_events = []
+_FLUSH_EVENTS = 1000
+_log_fd = -1
+_log_empty = True
+
+# At most _max_events are recorded per run or task (None for no limit);
+# later ones are only counted, and reported as one 'dropped' event
+_max_events = None
+_event_count = 0
+_dropped_events = 0
+
+
+def _read_exactly(fd, size):
+    """Read size bytes from fd, or return None at EOF.
+    
+    Uses os.read so nothing past the frame is consumed; when the payload
+    comes in on stdin, the rest is left for the guest code.
+    """
+    chunks = []
+    while size:
+        chunk = os.read(fd, size)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _read_frame(fd):
+    """Read one 4-byte big-endian length-prefixed frame from fd."""
+    header = _read_exactly(fd, 4)
+    if header is None:
+        return None
+    return _read_exactly(fd, int.from_bytes(header, 'big'))
+
+
+def _write_log(data):
+    with memoryview(data) as view:
+        while view:
+            view = view[os.write(_log_fd, view):]
+
+
+def _flush_events():
+    # Appends the buffered events to the log's JSON array. Failures (e.g.
+    # MemoryError under RLIMIT_AS) lose the batch but are never shown to the
+    # guest.
+    global _log_empty
+    try:
+        if _task_events:
+            batch = json.dumps(_task_events)[1:-1]
+            _write_log((batch if _log_empty else ',' + batch).encode())
+            _log_empty = False
+    except Exception:
+        pass
+    finally:
+        _task_events.clear()
+
+
+def _write_events():
+    global _log_fd
+    if _log_fd < 0:
+        return
+    try:
+        _end_events()
+        _flush_events()
+        _write_log(b']')
+    except Exception:
+        pass
+    finally:
+        os.close(_log_fd)
+        _log_fd = -1
+
+
+def _open_log(log_fd):
+    # Opened up front as a raw fd, before any syscall filter can deny write opens
+    global _log_fd
+    _log_fd = log_fd
+    _write_log(b'[')
+    atexit.register(_write_events)
+    
+    # os._exit skips atexit, so write the events before exiting there too
+    original_os_exit = os._exit
+    def _os_exit(status):
+        _write_events()
+        original_os_exit(status)
+    os._exit = _os_exit
+
+
+def _end_events():
+    # Closes the current run or task's events with the count of dropped ones
+    global _event_count, _dropped_events
+    if _dropped_events:
+        _task_events.append({'type': 'dropped', 'count': _dropped_events})
+    _event_count = _dropped_events = 0
+
+
+def _log_event(event):
+    global _event_count, _dropped_events
+    if _max_events is not None and _event_count >= _max_events:
+        _dropped_events += 1
+        return
+    _event_count += 1
+    try:
+        event['t'] = time.monotonic_ns()
+        _task_events.append(event)
+        if _log_fd >= 0 and len(_task_events) >= _FLUSH_EVENTS:
+            _flush_events()
+    except:
+        pass
+
+
+def _apply_resource_limits(memory_limit_mb, cpu_limit_seconds):
+    try:
+        import resource
+    except ImportError:
+        _log_event({'type': 'resource_limit', 'limit_type': 'info', 'message': 'Resource limits not available on this platform (Windows)'})
+        return
+    
+    # Memory limit, enforced by the kernel when mmap/brk fail (raises MemoryError)
+    try:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        _log_event({'type': 'resource_limit', 'limit_type': 'memory_mb', 'value': memory_limit_mb})
+    except Exception as e:
+        _log_event({'type': 'resource_limit', 'limit_type': 'memory', 'error': str(e)})
+    
+    # CPU time limit (soft and hard limits in seconds); the kernel kills the
+    # process if the code swallows the TimeoutError and keeps spinning
+    if cpu_limit_seconds is not None:
+        try:
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit_seconds, cpu_limit_seconds))
+            _log_event({'type': 'resource_limit', 'limit_type': 'cpu_time_seconds', 'value': cpu_limit_seconds})
+        except Exception as e:
+            _log_event({'type': 'resource_limit', 'limit_type': 'cpu', 'error': str(e)})
+
+
+# Wall-clock timeout: SIGALRM raises TimeoutError inside the user code so it is
+# reported like any other exception. The parent still kills the process if the
+# code swallows it.
+_timeout_seconds = None
+_has_alarm = False
+_timed_out = False  # Set when the alarm fires, in case the code swallows the error
+
+
+def _raise_timeout(signum, frame):
+    global _timed_out
+    _timed_out = True
+    raise TimeoutError(f"Execution exceeded timeout of {_timeout_seconds} seconds")
+
+
+def _report_swallowed_timeout(stderr):
+    """Fail a run whose code caught the timeout's TimeoutError and carried on"""
+    global _timed_out
+    _timed_out = False
+    message = f"Execution exceeded timeout of {_timeout_seconds} seconds"
+    _log_event({'type': 'exception', 'exception_type': 'TimeoutError', 'message': message})
+    stderr.write(f"TimeoutError: {message}\n")
+
+
+def _install_alarm(timeout_seconds):
+    global _timeout_seconds, _has_alarm
+    _timeout_seconds = timeout_seconds
+    try:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        _has_alarm = True
+    except (AttributeError, ValueError):
+        _has_alarm = False  # No SIGALRM on Windows
+
+
+def _set_alarm(seconds):
+    if _has_alarm:
+        signal.setitimer(signal.ITIMER_REAL, seconds)
+
+
+# Allocation tracking (opt-in): tracemalloc slows down every allocation, so it
+# only runs when requested and just reports the peak
+_tracemalloc = None
+
+
+def _enable_allocation_tracking():
+    global _tracemalloc
+    import tracemalloc as _tracemalloc
+
+
+def _start_tracing():
+    if _tracemalloc is not None:
+        _tracemalloc.start()
+
+
+def _stop_tracing():
+    if _tracemalloc is not None and _tracemalloc.is_tracing():
+        _log_event({'type': 'resource_limit', 'limit_type': 'peak_traced_memory_bytes', 'value': _tracemalloc.get_traced_memory()[1]})
+        _tracemalloc.stop()
+
+
+def _install_syscall_filter(syscall_denylist):
+    # Kernel-level syscall filter (opt-in, needs libseccomp's Python bindings)
+    try:
+        import errno
+        import seccomp
+        syscall_filter = seccomp.SyscallFilter(defaction=seccomp.ALLOW)
+        denied = []
+        for name, arg, mask in syscall_denylist:
+            try:
+                if arg is None:
+                    syscall_filter.add_rule(seccomp.ERRNO(errno.EPERM), name)
+                else:
+                    syscall_filter.add_rule(seccomp.ERRNO(errno.EPERM), name,
+                                            seccomp.Arg(arg, seccomp.MASKED_EQ, mask, mask))
+                denied.append(name)
+            except Exception:
+                pass  # Syscall doesn't exist on this architecture
+        syscall_filter.load()
+        _log_event({'type': 'resource_limit', 'limit_type': 'syscall_filter', 'value': sorted(set(denied))})
+    except Exception as e:
+        _log_event({'type': 'resource_limit', 'limit_type': 'syscall_filter', 'error': str(e)})
+
+
+# Import hook to monitor imports
+class ImportHook:
+    __slots__ = ('builtin_import', 'restricted_modules', 'allowed_modules', 'dangerous_re', 'verdicts')
+    
+    def __init__(self, restricted_modules, allowed_modules, dangerous_patterns):
+        self.builtin_import = builtins.__import__
+        self.restricted_modules = frozenset(restricted_modules)
+        self.allowed_modules = frozenset(allowed_modules)
+        self.dangerous_re = re.compile(dangerous_patterns, re.IGNORECASE)
+        # (allowed, reason) per module name; the policy is fixed, so each name
+        # is only checked once however often it's imported
+        self.verdicts = {}
+    
+    def log_import(self, module_name, allowed, reason):
+        _log_event({
+            'type': 'import',
+            'module': module_name,
+            'allowed': allowed,
+            'reason': reason
+        })
+    
+    def __call__(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # Check if import is allowed
+        verdict = self.verdicts.get(name)
+        if verdict is None:
+            verdict = self.verdicts[name] = self.is_import_allowed(name)
+        allowed, reason = verdict
+        self.log_import(name, allowed, reason)
+        
+        # Instead of blocking, just log the warning and allow
+        if not allowed:
+            _original_stderr.write(f"WARNING: Restricted import '{name}' - {reason}\n")
+            _original_stderr.flush()
+        
+        return self.builtin_import(name, globals, locals, fromlist, level)
+    
+    def is_import_allowed(self, module_name):
+        # Check allowed FIRST (overrides restrictions)
+        if self.allowed_modules and module_name in self.allowed_modules:
+            return True, "Explicitly allowed (overrides restriction)"
+        if module_name in self.restricted_modules:
+            return False, f"Module '{module_name}' is restricted"
+        match = self.dangerous_re.search(module_name)
+        if match:
+            return False, f"Module '{module_name}' matches dangerous pattern '{match.group(0).lower()}'"
+        return True, "Allowed"
+
+
+# File operation hooks
+class FileHook:
+    __slots__ = ('allow_read', 'allow_write', 'allowed_paths', 'normalized_allowed_paths', 'original_open')
+    
+    def __init__(self, allow_read, allow_write, allowed_paths):
+        self.allow_read = allow_read
+        self.allow_write = allow_write
+        self.allowed_paths = allowed_paths or []
+        # Normalized once here instead of on every open
+        self.normalized_allowed_paths = [
+            (os.path.normpath(p), os.path.normpath(p) + os.sep) for p in self.allowed_paths
+        ]
+        self.original_open = _original_open
+    
+    def log_file_op(self, operation, path, allowed, reason):
+        _log_event({
+            'type': 'file_operation',
+            'operation': operation,
+            'path': path,
+            'allowed': allowed,
+            'reason': reason
+        })
+    
+    def is_path_allowed(self, path, operation):
+        if not self.normalized_allowed_paths:
+            return False, None
+        normalized_path = os.path.normpath(path)
+        for allowed_normalized, allowed_prefix in self.normalized_allowed_paths:
+            if normalized_path == allowed_normalized or normalized_path.startswith(allowed_prefix):
+                return True, f"File path '{path}' is explicitly allowed"
+        return False, None
+    
+    def open(self, file, mode='r', *args, **kwargs):
+        path = str(file)
+        is_read = 'r' in mode or 'a' in mode
+        is_write = 'w' in mode or 'a' in mode or 'x' in mode
+        
+        # Check if path is explicitly allowed (overrides general restrictions)
+        path_allowed, reason = self.is_path_allowed(path, 'read' if is_read else 'write')
+        if path_allowed:
+            self.log_file_op('open', path, True, reason or f"Mode: {mode}")
+            return self.original_open(file, mode, *args, **kwargs)
+        
+        # Instead of blocking, log warning and allow
+        if is_read and not self.allow_read:
+            self.log_file_op('read', path, False, "File read operations are disabled (WARNING)")
+            _original_stderr.write(f"WARNING: File read operation on '{path}' - File read operations are disabled\n")
+            _original_stderr.flush()
+        
+        if is_write and not self.allow_write:
+            self.log_file_op('write', path, False, "File write operations are disabled (WARNING)")
+            _original_stderr.write(f"WARNING: File write operation on '{path}' - File write operations are disabled\n")
+            _original_stderr.flush()
+        
+        self.log_file_op('open', path, True, f"Mode: {mode}")
+        return self.original_open(file, mode, *args, **kwargs)
+
+
+# Network operation hooks
+class NetworkHook:
+    __slots__ = ('allow_network', 'allowed_addresses')
+    
+    def __init__(self, allow_network, allowed_addresses):
+        self.allow_network = allow_network
+        self.allowed_addresses = allowed_addresses or []
+    
+    def log_network(self, operation, address, allowed, reason):
+        _log_event({
+            'type': 'network',
+            'operation': operation,
+            'address': address,
+            'allowed': allowed,
+            'reason': reason
+        })
+    
+    def is_address_allowed(self, address):
+        for allowed_addr in self.allowed_addresses:
+            if address.startswith(allowed_addr) or address == allowed_addr:
+                return True, f"Network address '{address}' is explicitly allowed"
+        return False, None
+    
+    def check_address(self, operation, address):
+        addr_allowed, reason = self.is_address_allowed(address)
+        if addr_allowed:
+            self.log_network(operation, address, True, reason)
+        elif not self.allow_network:
+            self.log_network(operation, address, False, "Network operations are disabled (WARNING)")
+            _original_stderr.write(f"WARNING: Network operation to '{address}' - Network operations are disabled\n")
+            _original_stderr.flush()
+    
+    def block_socket(self, address='unknown'):
+        # Check if address is explicitly allowed (overrides general restriction)
+        addr_allowed, reason = self.is_address_allowed(address)
+        if addr_allowed:
+            self.log_network('socket_create', address, True, reason or "Allowed")
+            return
+        
+        # Instead of blocking, log warning and allow
+        if not self.allow_network:
+            self.log_network('socket_create', address, False, "Network operations are disabled (WARNING)")
+            _original_stderr.write(f"WARNING: Network operation to '{address}' - Network operations are disabled\n")
+            _original_stderr.flush()
+
+
+def _format_address(address):
+    if isinstance(address, tuple) and len(address) >= 2:
+        return f"{address[0]}:{address[1]}"
+    return str(address)
+
+
+def _make_network_audit_hook(network_hook):
+    # Maps socket audit events to the operation names used in the report
+    operations = {'socket.connect': 'connect', 'socket.bind': 'bind', 'socket.sendto': 'sendto'}
+    
+    def audit(event, args):
+        if not event.startswith('socket.'):
+            return
+        try:
+            if event == 'socket.__new__':
+                network_hook.block_socket()
+            elif event in operations:
+                network_hook.check_address(operations[event], _format_address(args[1]))
+        except Exception:
+            pass  # An exception here would abort the guest's socket call
+    
+    return audit
+
+
+def _install_hooks(policy):
+    import_hook = ImportHook(policy['restricted_modules'], policy['allowed_modules'], policy['dangerous_patterns'])
+    file_hook = FileHook(policy['allow_file_read'], policy['allow_file_write'], policy['allowed_file_paths'])
+    network_hook = NetworkHook(policy['allow_network'], policy['allowed_network_addresses'])
+    
+    # Replace built-in import
+    builtins.__import__ = import_hook
+    
+    # Replace open function
+    builtins.open = file_hook.open
+    
+    # Sockets are watched through audit events raised by the interpreter
+    # core, which also covers sockets made by socketpair/create_connection
+    # and C code, and doesn't import socket up front. Skipped when the hook
+    # could never log anything.
+    if policy['needs_network_hook']:
+        sys.addaudithook(_make_network_audit_hook(network_hook))
+
+
+def _format_guest_traceback(e):
+    # Only the guest's frames are shown: the wrapper frame doing the exec and,
+    # for timeouts, the alarm handler raising TimeoutError are dropped
+    formatted = traceback.TracebackException(type(e), e, e.__traceback__)
+    formatted.stack[:] = [frame for frame in formatted.stack if frame.filename != __file__]
+    return ''.join(formatted.format())
+
+
+def _run_once(code, source):
+    """Run the code object as __main__, logging any exception it raises."""
+    # Lets tracebacks show the guest's source lines
+    linecache.cache['<sandbox>'] = (len(source), None, source.splitlines(True), '<sandbox>')
+    
+    global _timed_out
+    _start_tracing()
+    _set_alarm(_timeout_seconds)
+    try:
+        try:
+            exec(code, {'__name__': '__main__', '__builtins__': builtins})
+        finally:
+            # Cancelled before anything else runs, so the alarm can't go off
+            # in guest atexit handlers or while the log is being written
+            _set_alarm(0)
+    except Exception as e:
+        _timed_out = False  # Reported as the exception itself
+        formatted = _format_guest_traceback(e)
+        _log_event({
+            'type': 'exception',
+            'exception_type': type(e).__name__,
+            'message': str(e),
+            'traceback': formatted
+        })
+        sys.stderr.write(formatted)
+        sys.exit(1)
+    finally:
+        _stop_tracing()
+        if _timed_out:
+            _report_swallowed_timeout(sys.stderr)
+            sys.exit(1)
+
+
+class _CappedOutput(io.TextIOBase):
+    """In-memory text stream keeping the first limit bytes (as UTF-8) of what
+    is written; the rest is only counted in discarded."""
+    
+    def __init__(self, limit):
+        self._parts = []
+        self._room = limit
+        self.discarded = 0
+    
+    def writable(self):
+        return True
+    
+    def write(self, s):
+        if not isinstance(s, str):
+            raise TypeError(f"write() argument must be str, not {type(s).__name__}")
+        size = len(s.encode('utf-8', 'surrogatepass'))
+        if size <= self._room:
+            self._parts.append(s)
+            self._room -= size
+        else:
+            kept = s.encode('utf-8', 'surrogatepass')[:self._room].decode('utf-8', 'ignore')
+            kept_size = len(kept.encode('utf-8'))
+            self._parts.append(kept)
+            self._room -= kept_size
+            self.discarded += size - kept_size
+        return len(s)
+    
+    def getvalue(self):
+        return ''.join(self._parts)
+
+
+def _output_stream(limit):
+    return io.StringIO() if limit is None else _CappedOutput(limit)
+
+
+def _restore_builtins(snapshot):
+    """Undo a task's changes to the builtins module. Only attribute access is
+    used, as the task may have replaced any builtin function."""
+    current = builtins.__dict__
+    for name in current.keys() - snapshot.keys():
+        del current[name]
+    current.update(snapshot)
+
+
+def _serve(request_fd, response_fd, max_output_bytes=None):
+    """Persistent worker loop.
+    
+    Tasks and results are length-prefixed frames: tasks are marshaled
+    (code object, input) tuples compiled by the parent, results are JSON so
+    the parent never unmarshals or unpickles guest-controlled data.
+    """
+    global _original_stderr, _timed_out
+    responses = os.fdopen(response_fd, 'wb')
+    
+    # Builtins with the hooks installed, snapshotted once. Each task gets its
+    # own copy, and the builtins module is put back after every task, so
+    # changes a task makes to either never reach later tasks or this loop.
+    guest_builtins = dict(vars(builtins))
+    
+    while True:
+        request = _read_frame(request_fd)
+        if request is None:
+            break
+        code, input_data = marshal.loads(request)
+        
+        _end_events()  # Startup events aren't part of any task
+        _task_events.clear()
+        stdout = _output_stream(max_output_bytes)
+        stderr = _original_stderr = _output_stream(max_output_bytes)
+        sys.stdin = io.StringIO(input_data or '')
+        sys.stdout, sys.stderr = stdout, stderr
+        return_code = 0
+        _timed_out = False
+        try:
+            _start_tracing()
+            _set_alarm(_timeout_seconds)
+            try:
+                exec(code, {'__name__': '__main__', '__builtins__': dict(guest_builtins)})
+            finally:
+                _set_alarm(0)
+                _restore_builtins(guest_builtins)
+        except SystemExit as e:
+            return_code = e.code if isinstance(e.code, int) else int(e.code is not None)
+        except Exception as e:
+            _timed_out = False  # Reported as the exception itself
+            formatted = _format_guest_traceback(e)
+            _log_event({
+                'type': 'exception',
+                'exception_type': type(e).__name__,
+                'message': str(e),
+                'traceback': formatted
+            })
+            stderr.write(formatted)
+            return_code = 1
+        finally:
+            _set_alarm(0)
+            _stop_tracing()
+            sys.stdin, sys.stdout, sys.stderr = sys.__stdin__, sys.__stdout__, sys.__stderr__
+        if _timed_out:
+            _report_swallowed_timeout(stderr)
+            return_code = 1
+        
+        _end_events()
+        response = json.dumps({
+            'stdout': stdout.getvalue(),
+            'stderr': stderr.getvalue(),
+            'return_code': return_code,
+            'discarded': getattr(stdout, 'discarded', 0) + getattr(stderr, 'discarded', 0),
+            'events': _task_events
+        }).encode()
+        responses.write(len(response).to_bytes(4, 'big') + response)
+        responses.flush()
+
+
+def main():
+    global _max_events
+    payload_fd = int(sys.argv[1])
+    payload = json.loads(_read_frame(payload_fd))
+    policy = payload['policy']
+    _max_events = payload.get('max_activities')
+    
+    # Run in the directory the parent picked, and resolve guest imports
+    # against it rather than this script's directory
+    if payload.get('cwd'):
+        os.chdir(payload['cwd'])
+    sys.path[0] = os.getcwd()
+    
+    if payload.get('log_fd') is not None:
+        _open_log(payload['log_fd'])
+    elif payload.get('log_file'):
+        _open_log(os.open(payload['log_file'], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600))
+    _apply_resource_limits(policy['memory_limit_mb'], payload.get('cpu_limit_seconds'))
+    _install_alarm(policy['timeout_seconds'])
+    if policy['track_allocations']:
+        _enable_allocation_tracking()
+    if policy['syscall_denylist']:
+        _install_syscall_filter(policy['syscall_denylist'])
+    _install_hooks(policy)
+    
+    if len(sys.argv) > 2:
+        _serve(payload_fd, int(sys.argv[2]), payload.get('max_output_bytes'))
+    else:
+        # The code object, compiled by the parent, follows the JSON payload
+        code = marshal.loads(_read_frame(payload_fd))
+        if payload_fd != 0:
+            os.close(payload_fd)
+        _run_once(code, payload['source'])
+
+
+if __name__ == '__main__':
+    main()
@@ -4,72 +4,97 @@
 import json
 import sys
 
+# orjson parses large reports several times faster; it takes bytes directly
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 if len(sys.argv) < 2:
     print("Usage: python show_report.py <report.json>")
     sys.exit(1)
 
 report_file = sys.argv[1]
 
-with open(report_file, 'r') as f:
-    data = json.load(f)
+if orjson is not None:
+    with open(report_file, 'rb') as f:
+        data = orjson.loads(f.read())
+else:
+    with open(report_file, 'r') as f:
+        data = json.load(f)
+
+STATUS_ALLOWED = "✓ ALLOWED"
+STATUS_BLOCKED = "✗ BLOCKED"
+
+# The report is assembled in memory and written with one call at the end,
+# rather than one print per line
+lines = []
+out = lines.append
 
-print("=" * 60)
-print("DETAILED SANDBOX ACTIVITY REPORT")
-print("=" * 60)
+out("=" * 60)
+out("DETAILED SANDBOX ACTIVITY REPORT")
+out("=" * 60)
 
 # Execution summary
 summary = data['execution_summary']
-print(f"\nExecution Summary:")
-print(f"  Duration: {summary['duration_seconds']:.3f} seconds")
-print(f"  Start: {summary['start_time']}")
-print(f"  End: {summary['end_time']}")
-print(f"  Total Activities: {summary['total_activities']}")
+out(f"\nExecution Summary:")
+out(f"  Duration: {summary['duration_seconds']:.3f} seconds")
+out(f"  Start: {summary['start_time']}")
+out(f"  End: {summary['end_time']}")
+out(f"  Total Activities: {summary['total_activities']}")
+if summary.get('dropped_activities'):
+    out(f"  Dropped Activities: {summary['dropped_activities']}")
 
 # Imports
 imports = data['imports']
-print(f"\nImports ({imports['total']} total):")
-print(f"  Allowed: {imports['allowed']}")
-print(f"  Blocked: {imports['blocked']}")
+out(f"\nImports ({imports['total']} total):")
+out(f"  Allowed: {imports['allowed']}")
+out(f"  Blocked: {imports['blocked']}")
 if imports['details']:
-    print("\n  Details:")
+    out("\n  Details:")
     for imp in imports['details']:
-        status = "✓ ALLOWED" if imp['details']['allowed'] else "✗ BLOCKED"
-        print(f"    {status}: {imp['details']['module']}")
-        if not imp['details']['allowed']:
-            print(f"      Reason: {imp['details']['reason']}")
+        d = imp['details']
+        allowed = d['allowed']
+        out(f"    {STATUS_ALLOWED if allowed else STATUS_BLOCKED}: {d['module']}")
+        if not allowed:
+            out(f"      Reason: {d['reason']}")
 
 # File operations
 file_ops = data['file_operations']
-print(f"\nFile Operations ({file_ops['total']} total):")
-print(f"  Allowed: {file_ops['allowed']}")
-print(f"  Blocked: {file_ops['blocked']}")
+out(f"\nFile Operations ({file_ops['total']} total):")
+out(f"  Allowed: {file_ops['allowed']}")
+out(f"  Blocked: {file_ops['blocked']}")
 if file_ops['details']:
-    print("\n  Details:")
+    out("\n  Details:")
     for op in file_ops['details']:
-        status = "✓ ALLOWED" if op['details']['allowed'] else "✗ BLOCKED"
-        print(f"    {status}: {op['details']['operation']} on {op['details']['path']}")
-        if not op['details']['allowed']:
-            print(f"      Reason: {op['details']['reason']}")
+        d = op['details']
+        allowed = d['allowed']
+        out(f"    {STATUS_ALLOWED if allowed else STATUS_BLOCKED}: {d['operation']} on {d['path']}")
+        if not allowed:
+            out(f"      Reason: {d['reason']}")
 
 # Network operations
 net_ops = data['network_operations']
-print(f"\nNetwork Operations ({net_ops['total']} total):")
-print(f"  Allowed: {net_ops['allowed']}")
-print(f"  Blocked: {net_ops['blocked']}")
+out(f"\nNetwork Operations ({net_ops['total']} total):")
+out(f"  Allowed: {net_ops['allowed']}")
+out(f"  Blocked: {net_ops['blocked']}")
 if net_ops['details']:
-    print("\n  Details:")
+    out("\n  Details:")
     for op in net_ops['details']:
-        status = "✓ ALLOWED" if op['details']['allowed'] else "✗ BLOCKED"
-        print(f"    {status}: {op['details']['operation']} to {op['details'].get('address', 'unknown')}")
-        if not op['details']['allowed']:
-            print(f"      Reason: {op['details']['reason']}")
+        d = op['details']
+        allowed = d['allowed']
+        out(f"    {STATUS_ALLOWED if allowed else STATUS_BLOCKED}: {d['operation']} to {d.get('address', 'unknown')}")
+        if not allowed:
+            out(f"      Reason: {d['reason']}")
 
 # Exceptions
 exceptions = data['exceptions']
-print(f"\nExceptions ({exceptions['total']} total):")
+out(f"\nExceptions ({exceptions['total']} total):")
 if exceptions['details']:
     for exc in exceptions['details']:
-        print(f"  {exc['details']['exception_type']}: {exc['details']['message']}")
+        d = exc['details']
+        out(f"  {d['exception_type']}: {d['message']}")
 
-print("\n" + "=" * 60)
+out("\n" + "=" * 60)
 
+sys.stdout.write('\n'.join(lines) + '\n')
@@ -4,36 +4,64 @@ Test client for the sandbox server
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 import json
 
+# orjson encodes request bodies and decodes responses faster, straight
+# to and from bytes
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 SERVER_URL = 'http://localhost:8000'
 
+# One session for all calls, so the TCP connection is reused between
+# requests instead of reopened for each
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+# Set once rather than per call. requests already sends Accept-Encoding
+# for the codings it can decode (gzip, plus br when brotli is installed),
+# so compressed responses from the server are handled transparently.
+SESSION.headers['Content-Type'] = 'application/json'
+
+def _dumps(payload) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload).encode()
+
+def _loads(content: bytes):
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
 def test_health():
     """Test health endpoint"""
     print("Testing health endpoint...")
-    response = requests.get(f'{SERVER_URL}/health')
+    response = SESSION.get(f'{SERVER_URL}/health')
     print(f"Status: {response.status_code}")
     print(f"Response: {json.dumps(response.json(), indent=2)}")
     print()
 
-def test_execute(code, **kwargs):
-    """Test execute endpoint"""
-    print(f"Executing code:\n{code}\n")
-    print("-" * 60)
-    
+def post_execute(code, **kwargs):
+    """Send code to the execute endpoint; returns (status code, result)"""
     payload = {
         'code': code,
         **kwargs
     }
     
-    response = requests.post(
-        f'{SERVER_URL}/execute',
-        json=payload,
-        headers={'Content-Type': 'application/json'}
-    )
+    # Sent as ready-made bytes rather than json=, which re-serializes
+    # with the stdlib and resets the headers on every call
+    response = SESSION.post(f'{SERVER_URL}/execute', data=_dumps(payload))
+    return response.status_code, _loads(response.content)
+
+def print_execute_result(code, status_code, result):
+    """Print the outcome of an execute request"""
+    print(f"Executing code:\n{code}\n")
+    print("-" * 60)
     
-    print(f"Status: {response.status_code}")
-    result = response.json()
+    print(f"Status: {status_code}")
     
     print(f"\nSTDOUT:\n{result.get('stdout', '')}")
     if result.get('stderr'):
@@ -52,6 +80,10 @@ def test_execute(code, **kwargs):
     print("=" * 60)
     print()
 
+def test_execute(code, **kwargs):
+    """Test execute endpoint"""
+    print_execute_result(code, *post_execute(code, **kwargs))
+
 if __name__ == '__main__':
     print("Sandbox Runner API Test Client")
     print("=" * 60)
@@ -65,37 +97,46 @@ if __name__ == '__main__':
         print("  python sandbox_server.py")
         exit(1)
     
-    # Test 1: Simple code
-    test_execute("""
+    tests = [
+        # Test 1: Simple code
+        ("""
 print("Hello from sandbox!")
 result = sum(range(1, 11))
 print(f"Sum: {result}")
-""")
-    
-    # Test 2: Restricted import
-    test_execute("""
+""", {}),
+        
+        # Test 2: Restricted import
+        ("""
 try:
     import os
     print("os imported")
 except ImportError as e:
     print(f"Import blocked: {e}")
-""")
-    
-    # Test 3: File operation (blocked)
-    test_execute("""
+""", {}),
+        
+        # Test 3: File operation (blocked)
+        ("""
 try:
     with open('test.txt', 'w') as f:
         f.write("test")
     print("File write succeeded")
 except PermissionError as e:
     print(f"File write blocked: {e}")
-""")
-    
-    # Test 4: With custom config
-    test_execute("""
+""", {}),
+        
+        # Test 4: With custom config
+        ("""
 import math
 print(f"Pi = {math.pi}")
-""", timeout=5.0, allow_file_read=True)
+""", {'timeout': 5.0, 'allow_file_read': True}),
+    ]
+    
+    # The server runs requests in parallel, so send them all at once and
+    # print the results in order as they come back
+    with ThreadPoolExecutor(max_workers=len(tests)) as executor:
+        futures = [executor.submit(post_execute, code, **kwargs) for code, kwargs in tests]
+        for (code, _), future in zip(tests, futures):
+            print_execute_result(code, *future.result())
     
     print("All tests completed!")
 
@@ -82,7 +82,7 @@ print("\n5. Testing normal operations...")
 numbers = [x**2 for x in range(10)]
 print(f"   [OK] List comprehension: {numbers}")
 
-result = sum(range(1, 101))
+result = 100 * 101 // 2  # closed form of sum(range(1, 101))
 print(f"   [OK] Sum calculation: {result}")
 
 print("\n=== Test Completed ===")
@@ -4,7 +4,7 @@ Safe test script - should execute successfully
 """
 
 # Simple math operations
-result = sum(range(1, 101))
+result = 100 * 101 // 2  # closed form of sum(range(1, 101))
 print(f"Sum of 1 to 100: {result}")
 
 # List comprehensions